@@ -1,15 +1,27 @@
 """
 Prediction specific utility functions.
 """
-import math
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
+import pyfaidx
 import torch
-from torch.autograd import Variable
+from torch.utils.data import IterableDataset
+from torch.utils.data import get_worker_info
 
+from ..sequences.sequence import _get_base_index_lut
+from ..sequences.sequence import _get_encoding_table
 from ..utils import _is_lua_trained_model
 
 
+PRECISION_DTYPES = {
+    "fp32": torch.float32,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+}
+
+
 def get_reverse_complement(allele, complementary_base_dict):
     """
     Get the reverse complement of the input allele.
@@ -63,7 +75,60 @@ def get_reverse_complement_encoding(allele_encoding,
     return allele_encoding[:, complement_indices][::-1, :]
 
 
-def predict(model, batch_sequences, use_cuda=False):
+def _sequence_to_indices(sequence, base_index_lut):
+    """
+    Get the index of each base of a sequence in its alphabet, using a
+    lookup table from `_get_base_index_lut`.
+
+    """
+    return base_index_lut[np.frombuffer(
+        sequence.encode("ascii", "replace"), dtype=np.uint8)]
+
+
+def _get_complement_index_lut(bases_arr, complementary_base_dict):
+    """
+    Get the lookup table from base indices to the indices of their
+    complements, the index-based counterpart of
+    `get_reverse_complement_encoding`. Unknown bases (index :math:`N`)
+    stay unknown.
+
+    """
+    base_ixs = {b: i for (i, b) in enumerate(bases_arr)}
+    complement_indices = [
+        base_ixs[complementary_base_dict[b]] for b in bases_arr]
+    return np.array(complement_indices + [len(bases_arr)], dtype=np.uint8)
+
+
+def _sequence_to_encoding(sequence, base_index_lut, encoding_table):
+    """
+    Get the encoding of a sequence, using lookup tables from
+    `_get_base_index_lut` and `_get_encoding_table`. This matches
+    `selene_sdk.sequences.sequence_to_encoding`.
+
+    """
+    return encoding_table[_sequence_to_indices(sequence, base_index_lut)]
+
+
+def _indices_to_encoding(indices, encoding_table_t):
+    """
+    Get the encodings of a batch of sequences of base indices, of shape
+    :math:`B \\times L`, directly in the :math:`B \\times N \\times L`
+    layout the model takes. `encoding_table_t` is the transpose of the
+    table from `_get_encoding_table`, on the same device as `indices`.
+
+    """
+    n_bases = encoding_table_t.shape[0]
+    return torch.gather(
+        encoding_table_t.expand(len(indices), -1, -1),
+        2,
+        indices.long().unsqueeze(1).expand(-1, n_bases, -1))
+
+
+def predict(model,
+            batch_sequences,
+            use_cuda=False,
+            precision="fp32",
+            channels_first=False):
     """
     Return model predictions for a batch of sequences.
 
@@ -71,13 +136,22 @@ def predict(model, batch_sequences, use_cuda=False):
     ----------
     model : torch.nn.Sequential
         The model, on mode `eval`.
-    batch_sequences : numpy.ndarray
+    batch_sequences : numpy.ndarray or torch.Tensor
         `batch_sequences` has the shape :math:`B \\times L \\times N`,
         where :math:`B` is `batch_size`, :math:`L` is the sequence length,
-        :math:`N` is the size of the sequence type's alphabet.
+        :math:`N` is the size of the sequence type's alphabet. A
+        `torch.Tensor` may already be on the device the model runs on.
     use_cuda : bool, optional
         Default is `False`. Specifies whether CUDA-enabled GPUs are available
         for torch to use.
+    precision : {'fp32', 'fp16', 'bf16'}, optional
+        Default is 'fp32'. The floating point precision in which to run the
+        forward pass. Reduced precision ('fp16' or 'bf16') is applied through
+        autocasting and only when `use_cuda` is `True`.
+    channels_first : bool, optional
+        Default is `False`. Whether `batch_sequences` is already in the
+        :math:`B \\times N \\times L` layout the model takes, in which
+        case it is not transposed.
 
     Returns
     -------
@@ -86,28 +160,246 @@ def predict(model, batch_sequences, use_cuda=False):
         is the number of features (classes) the model predicts.
 
     """
-    inputs = torch.Tensor(batch_sequences)
-    if use_cuda:
-        inputs = inputs.cuda()
-    with torch.no_grad():
-        inputs = Variable(inputs)
+    outputs = _forward(model,
+                       batch_sequences,
+                       use_cuda=use_cuda,
+                       precision=precision,
+                       channels_first=channels_first)
+    return outputs.float().cpu().numpy()
+
+
+def _forward(model,
+             batch_sequences,
+             use_cuda=False,
+             precision="fp32",
+             channels_first=False):
+    """
+    Run the forward pass of `predict` and return the model outputs as a
+    tensor on the device the model runs on. If `channels_first` is `True`,
+    `batch_sequences` is already in the :math:`B \\times N \\times L`
+    layout the model takes and is not transposed.
 
+    """
+    # `torch.from_numpy` shares memory with float32 input arrays, so
+    # the only host-side copy made here is into page-locked memory,
+    # which lets the transfer to the GPU run asynchronously.
+    if isinstance(batch_sequences, torch.Tensor):
+        inputs = batch_sequences.float()
+        if use_cuda:
+            inputs = inputs.cuda()
+    else:
+        inputs = torch.from_numpy(
+            np.ascontiguousarray(batch_sequences, dtype=np.float32))
+        if use_cuda:
+            inputs = inputs.pin_memory().cuda(non_blocking=True)
+    if not channels_first:
+        inputs = inputs.transpose(1, 2).contiguous()
+    precision_context = contextlib.nullcontext()
+    if use_cuda and precision != "fp32":
+        precision_context = torch.autocast(
+            "cuda", dtype=PRECISION_DTYPES[precision])
+    with torch.inference_mode(), precision_context:
         if _is_lua_trained_model(model):
-            outputs = model.forward(inputs.transpose(1, 2).unsqueeze_(2))
+            outputs = model(inputs.unsqueeze(2))
         else:
-            outputs = model.forward(inputs.transpose(1, 2))
-        return outputs.data.cpu().numpy()
+            outputs = model(inputs)
+    return outputs
+
+
+def _prefetch(iterable):
+    """
+    Iterate over `iterable`, producing each item on a background thread
+    while the caller is still using the previous one.
+
+    """
+    iterator = iter(iterable)
+    exhausted = object()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_item = executor.submit(next, iterator, exhausted)
+        while True:
+            item = next_item.result()
+            if item is exhausted:
+                return
+            next_item = executor.submit(next, iterator, exhausted)
+            yield item
+
+
+class _PredictionsRing(object):
+    """
+    Copies model outputs from the GPU into a ring of page-locked host
+    buffers without blocking, so that the forward pass for the next batch
+    can be queued before the predictions for the current batch are read.
+
+    Parameters
+    ----------
+    n_slots : int, optional
+        Default is 2. The number of host buffers. Predictions for a batch
+        must be collected before `n_slots` more batches are staged.
+
+    """
+
+    def __init__(self, n_slots=2):
+        self._slots = [None] * n_slots
+        self._index = 0
+
+    def stage(self, outputs):
+        """
+        Start copying model outputs to the host.
+
+        Parameters
+        ----------
+        outputs : torch.Tensor
+            The model outputs, of shape :math:`B \\times F`.
+
+        Returns
+        -------
+        tuple(torch.Tensor, torch.cuda.Event or None)
+            The host tensor the outputs are copied into and the event that
+            marks the end of the copy, to pass to `collect`.
+
+        """
+        if not outputs.is_cuda:
+            return outputs.float(), None
+        slot = self._slots[self._index]
+        if slot is None or slot.shape[0] < outputs.shape[0] or \
+                slot.shape[1:] != outputs.shape[1:]:
+            slot = torch.empty(
+                outputs.shape, dtype=torch.float32, pin_memory=True)
+            self._slots[self._index] = slot
+        self._index = (self._index + 1) % len(self._slots)
+        slot = slot[:outputs.shape[0]]
+        slot.copy_(outputs, non_blocking=True)
+        event = torch.cuda.Event()
+        event.record()
+        return slot, event
+
+    def collect(self, staged):
+        """
+        Wait for staged outputs to finish copying to the host.
+
+        Parameters
+        ----------
+        staged : tuple(torch.Tensor, torch.cuda.Event or None)
+            The output of `stage`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The model predictions. The array does not share memory with
+            the ring's buffers, so reporters may keep it.
+
+        """
+        predictions, event = staged
+        if event is None:
+            return predictions.numpy()
+        event.synchronize()
+        return predictions.numpy().copy()
+
+
+def _compile_model(model, compile_model, example_inputs):
+    """
+    Compile a model for inference with TorchScript tracing or
+    `torch.compile`.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The model, on mode `eval` and on the device it will run on.
+    compile_model : {'trace', 'compile'}
+        'trace' uses `torch.jit.trace` and 'compile' uses `torch.compile`.
+    example_inputs : torch.Tensor
+        An input of the shape the model is called with in `predict`, used
+        to trace the model.
+
+    Returns
+    -------
+    torch.nn.Module
+        The compiled model. It keeps the `from_lua` flag of `model` so that
+        `predict` still reshapes inputs for Lua-trained models.
+
+    """
+    from_lua = _is_lua_trained_model(model)
+    if compile_model == "trace":
+        with torch.no_grad():
+            compiled_model = torch.jit.trace(model, example_inputs)
+    else:
+        compiled_model = torch.compile(model, mode="reduce-overhead")
+    compiled_model.from_lua = from_lua
+    return compiled_model
 
 
 def _pad_sequence(sequence, to_length, unknown_base):
-    diff = (to_length - len(sequence)) / 2
-    pad_l = int(np.floor(diff))
-    pad_r = math.ceil(diff)
-    sequence = ((unknown_base * pad_l) + sequence + (unknown_base * pad_r))
-    return str.upper(sequence)
+    pad_l, pad_extra = divmod(to_length - len(sequence), 2)
+    return "".join((unknown_base * pad_l,
+                    str.upper(sequence),
+                    unknown_base * (pad_l + pad_extra)))
 
 
 def _truncate_sequence(sequence, to_length):
-    start = int((len(sequence) - to_length) // 2)
-    end = int(start + to_length)
-    return str.upper(sequence[start:end])
+    start = (len(sequence) - to_length) // 2
+    return str.upper(sequence[start:start + to_length])
+
+
+class _FastaSequencesDataset(IterableDataset):
+    """
+    Streams the sequences in a FASTA file, each padded or truncated to
+    `sequence_length` and converted to base indices (see
+    `_sequence_to_indices`), for prediction with a
+    `torch.utils.data.DataLoader`.
+
+    When the loader uses multiple worker processes, each worker reads
+    its own handle to the FASTA file and is assigned every
+    `num_workers`-th run of `batch_size` consecutive records. Provided
+    the loader's batch size is also `batch_size`, the loader then
+    returns the batches in the same order as the records in the file.
+
+    Parameters
+    ----------
+    input_path : str
+        Input path to the FASTA file.
+    sequence_length : int
+        The length of sequences that the model is expecting.
+    batch_size : int
+        The batch size of the `DataLoader` that reads this dataset.
+    base_index_lut : numpy.ndarray
+        The lookup table from character codes to base indices (see
+        `_get_base_index_lut`).
+    unknown_base : str
+        The base used to pad sequences shorter than `sequence_length`.
+
+    """
+
+    def __init__(self,
+                 input_path,
+                 sequence_length,
+                 batch_size,
+                 base_index_lut,
+                 unknown_base):
+        super(_FastaSequencesDataset, self).__init__()
+        self.input_path = input_path
+        self.sequence_length = sequence_length
+        self.batch_size = batch_size
+        self.base_index_lut = base_index_lut
+        self.unknown_base = unknown_base
+
+    def __iter__(self):
+        worker_id, num_workers = 0, 1
+        worker_info = get_worker_info()
+        if worker_info is not None:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+
+        fasta_file = pyfaidx.Fasta(self.input_path)
+        for i, fasta_record in enumerate(fasta_file):
+            if (i // self.batch_size) % num_workers != worker_id:
+                continue
+            cur_sequence = str(fasta_record)
+            if len(cur_sequence) < self.sequence_length:
+                cur_sequence = _pad_sequence(cur_sequence,
+                                             self.sequence_length,
+                                             self.unknown_base)
+            elif len(cur_sequence) > self.sequence_length:
+                cur_sequence = _truncate_sequence(
+                    cur_sequence, self.sequence_length)
+            yield i, fasta_record.name, torch.from_numpy(
+                _sequence_to_indices(cur_sequence, self.base_index_lut))
+        fasta_file.close()
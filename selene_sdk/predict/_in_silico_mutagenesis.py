@@ -1,5 +1,3 @@
-import itertools
-
 import numpy as np
 
 from ..sequences import Genome
@@ -11,11 +9,12 @@ def in_silico_mutagenesis_sequences(sequence,
                                     start_position=0,
                                     end_position=None):
     """
-    Creates a list containing each mutation that occurs from an
-    *in silico* mutagenesis across the whole sequence.
+    Creates the set of mutations that occur from an *in silico*
+    mutagenesis across the whole sequence.
 
-    Please note that we have not parallelized this function yet, so
-    runtime increases exponentially when you increase `mutate_n_bases`.
+    Please note that the number of mutations, and so the runtime and
+    memory used, increases exponentially when you increase
+    `mutate_n_bases`.
 
     Parameters
     ----------
@@ -38,14 +37,18 @@ def in_silico_mutagenesis_sequences(sequence,
 
     Returns
     -------
-    list(list(tuple))
-        A list of all possible mutations. Each element in the list is
-        itself a list of tuples, e.g. element = [(0, 'T')] when only mutating
-        1 base at a time. Each tuple is the position to mutate and the base
-        with which we are replacing the reference base.
+    tuple(numpy.ndarray, numpy.ndarray)
+        All possible mutations, as a pair of :math:`M \\times n` arrays
+        (where :math:`M` is the number of mutations and :math:`n` is
+        `mutate_n_bases`). The first array (dtype `numpy.int32`) holds
+        the positions to mutate and the second (dtype `numpy.uint8`) holds
+        the index in `reference_sequence.BASES_ARR` of the base with which
+        we are replacing the reference base at each position, e.g. row
+        `[0], [3]` when only mutating 1 base at a time means position 0 is
+        mutated to 'T' for a `selene_sdk.sequences.Genome`.
 
         For a sequence of length 1000, mutating 1 base at a time means that
-        we return a list with length of 3000-4000, depending on the number of
+        we return arrays with 3000-4000 rows, depending on the number of
         unknown bases in the input sequences.
 
     Raises
@@ -88,23 +91,41 @@ def in_silico_mutagenesis_sequences(sequence,
                           "{0} currently, but {1} bases must be mutated at a "
                           "time").format(end_position - start_position, mutate_n_bases))
 
-    sequence_alts = []
-    for index, ref in enumerate(sequence):
-        alts = []
-        for base in reference_sequence.BASES_ARR:
-            if base == ref:
-                continue
-            alts.append(base)
-        sequence_alts.append(alts)
-    all_mutated_sequences = []
-    for indices in itertools.combinations(
-            range(start_position, end_position), mutate_n_bases):
-        pos_mutations = []
-        for i in indices:
-            pos_mutations.append(sequence_alts[i])
-        for mutations in itertools.product(*pos_mutations):
-            all_mutated_sequences.append(list(zip(indices, mutations)))
-    return all_mutated_sequences
+    bases_arr = np.asarray(reference_sequence.BASES_ARR)
+    sequence_arr = np.array(list(sequence[start_position:end_position]))
+    alts_mask = sequence_arr[:, np.newaxis] != bases_arr[np.newaxis, :]
+    positions, alt_indices = np.nonzero(alts_mask)
+    positions = (positions + start_position).astype(np.int32)
+    alt_indices = alt_indices.astype(np.uint8)
+    if mutate_n_bases == 1:
+        return positions.reshape(-1, 1), alt_indices.reshape(-1, 1)
+
+    # Extend each set of mutations one base at a time with every
+    # single-base mutation at a later position. `positions` is sorted,
+    # so the single-base mutations after position `p` are
+    # `next_mutation[p - start_position]:` onwards.
+    n_mutations = len(positions)
+    next_mutation = np.searchsorted(
+        positions, np.arange(start_position, end_position), side="right")
+    mutation_indices = np.arange(n_mutations).reshape(-1, 1)
+    for _ in range(1, mutate_n_bases):
+        first = next_mutation[
+            positions[mutation_indices[:, -1]] - start_position]
+        counts = n_mutations - first
+        offsets = first - (np.cumsum(counts) - counts)
+        extension = np.arange(counts.sum()) + np.repeat(offsets, counts)
+        mutation_indices = np.hstack([
+            np.repeat(mutation_indices, counts, axis=0),
+            extension.reshape(-1, 1)])
+
+    # Order by the positions mutated and then by the bases they are
+    # mutated to.
+    mutated_positions = positions[mutation_indices]
+    mutated_alts = alt_indices[mutation_indices]
+    order = np.lexsort(
+        [mutated_alts[:, j] for j in reversed(range(mutate_n_bases))] +
+        [mutated_positions[:, j] for j in reversed(range(mutate_n_bases))])
+    return mutated_positions[order], mutated_alts[order]
 
 
 def mutate_sequence(encoding,
@@ -143,28 +164,37 @@ def mutate_sequence(encoding,
     return mutated_seq
 
 
-def _ism_sample_id(sequence, mutation_information):
+def _ism_sample_ids(sequence_arr, bases_arr, positions, alt_indices):
     """
-    TODO
+    Gets the identifiers for a batch of mutations.
 
     Parameters
     ----------
-    sequence : str
-        The input sequence to mutate.
-    mutation_information : list(tuple)
-        TODO
+    sequence_arr : numpy.ndarray
+        The input sequence to mutate, as an array of single characters.
+    bases_arr : numpy.ndarray
+        The characters in the sequence's alphabet.
+    positions : numpy.ndarray
+        The :math:`B \\times n` positions mutated in each sequence of
+        the batch.
+    alt_indices : numpy.ndarray
+        The :math:`B \\times n` indices in `bases_arr` of the bases to
+        which each position is mutated.
 
     Returns
     -------
-    TODO
-        TODO
+    numpy.ndarray
+        A :math:`B \\times 3` array of the (position, ref, alt) strings
+        identifying each mutation. When more than 1 base is mutated at a
+        time, the values in each column are joined by ';'.
 
     """
-    positions = []
-    refs = []
-    alts = []
-    for (position, alt) in mutation_information:
-        positions.append(str(position))
-        refs.append(sequence[position])
-        alts.append(alt)
-    return (';'.join(positions), ';'.join(refs), ';'.join(alts))
+    columns = []
+    for values in (positions.astype(str),
+                   sequence_arr[positions],
+                   bases_arr[alt_indices]):
+        joined = values[:, 0]
+        for j in range(1, values.shape[1]):
+            joined = np.char.add(np.char.add(joined, ';'), values[:, j])
+        columns.append(joined)
+    return np.stack(columns, axis=1)
@@ -1,7 +1,12 @@
-import math
+from collections import OrderedDict
+import copy
 
 import numpy as np
+import torch
+from torch.utils.data import IterableDataset
+from torch.utils.data import get_worker_info
 
+from ._common import _sequence_to_indices
 from ._common import _truncate_sequence
 from ._common import predict
 
@@ -9,16 +14,36 @@ from ._common import predict
 VCF_REQUIRED_COLS = ["#CHROM", "POS", "ID", "REF", "ALT"]
 
 
+def _canonicalize_chrom(chrom, reference_sequence):
+    """
+    Return the name under which the chromosome `chrom` of a VCF file
+    is looked up in `reference_sequence` (e.g. "1" -> "chr1").
+
+    """
+    chrom = str(chrom)
+    if 'CHR' == chrom[:3]:
+        chrom = chrom.replace('CHR', 'chr')
+    elif "chr" not in chrom:
+        chrom = "chr" + chrom
+
+    if chrom == "chrMT" and \
+            chrom not in reference_sequence.get_chrs():
+        chrom = "chrM"
+    return chrom
+
+
 # TODO: Is this a general method that might belong in utils?
-def read_vcf_file(input_path,
+def iter_vcf_file(input_path,
                   strand_index=None,
                   require_strand=False,
                   output_NAs_to_file=None,
                   seq_context=None,
-                  reference_sequence=None):
+                  reference_sequence=None,
+                  line_numbers=False):
     """
-    Read the relevant columns for a variant call format (VCF) file to
-    collect variants for variant effect prediction.
+    Read the relevant columns for a variant call format (VCF) file and
+    yield the variants for variant effect prediction one at a time, so
+    that the file does not have to be held in memory.
 
     Parameters
     ----------
@@ -53,44 +78,58 @@ def read_vcf_file(input_path,
     reference_sequence : selene_sdk.sequences.Genome or None, optional
         Default is None. Only used if `seq_context` is not None.
         The reference genome.
-
-    Returns
-    -------
-    list(tuple)
-        List of variants. Tuple = (chrom, position, id, ref, alt, strand)
+    line_numbers : bool, optional
+        Default is False. If True, each variant also holds the (0-based)
+        number of the line in the VCF file it was read from, so that the
+        line can be written to the NA file if the variant's sequences
+        later turn out to be invalid.
+
+    Yields
+    ------
+    tuple
+        A variant: (chrom, position, id, ref, alt, strand), followed by
+        the line number if `line_numbers` is True. Multi-allelic variants
+        are yielded once per alt, consecutively.
+
+    Notes
+    -----
+    The invalid variants are written to `output_NAs_to_file` once the
+    file has been read to the end.
 
     """
-    variants = []
     na_rows = []
+    chrom_names = {}
+    # Only split off the columns we use: VCFs may have many sample
+    # columns after the ones we need.
+    n_splits = 5
+    if strand_index is not None:
+        n_splits = max(n_splits, strand_index + 1)
     with open(input_path, 'r') as file_handle:
-        lines = file_handle.readlines()
-        index = 0
-        for index, line in enumerate(lines):
-            if '#' not in line:
-                break
-            if "#CHROM" in line:
-                cols = line.strip().split('\t')
-                if cols[:5] != VCF_REQUIRED_COLS:
-                    raise ValueError(
-                        "First 5 columns in file {0} were {1}. "
-                        "Expected columns: {2}".format(
-                            input_path, cols[:5], VCF_REQUIRED_COLS))
-                index += 1
-                break
-        for line in lines[index:]:
-            cols = line.strip().split('\t')
+        in_header = True
+        for line_number, line in enumerate(file_handle):
+            if in_header:
+                if "#CHROM" in line:
+                    cols = line.strip().split('\t')
+                    if cols[:5] != VCF_REQUIRED_COLS:
+                        raise ValueError(
+                            "First 5 columns in file {0} were {1}. "
+                            "Expected columns: {2}".format(
+                                input_path, cols[:5], VCF_REQUIRED_COLS))
+                    in_header = False
+                    continue
+                elif '#' in line:
+                    continue
+                in_header = False
+            cols = line.strip().split('\t', n_splits)
             if len(cols) < 5:
                 na_rows.append(line)
                 continue
-            chrom = str(cols[0])
-            if 'CHR' == chrom[:3]:
-                chrom = chrom.replace('CHR', 'chr')
-            elif "chr" not in chrom:
-                chrom = "chr" + chrom
-
-            if chrom == "chrMT" and \
-                    chrom not in reference_sequence.get_chrs():
-                chrom = "chrM"
+            # Chromosome names repeat heavily, so each distinct name is
+            # canonicalized only once.
+            chrom = chrom_names.get(cols[0])
+            if chrom is None:
+                chrom = _canonicalize_chrom(cols[0], reference_sequence)
+                chrom_names[cols[0]] = chrom
 
             pos = int(cols[1])
             name = cols[2]
@@ -115,14 +154,85 @@ def read_vcf_file(input_path,
                 if not reference_sequence.coords_in_bounds(chrom, start, end):
                     na_rows.append(line)
                     continue
+            line_ids = (line_number,) if line_numbers else ()
+            # Most variants have a single alt, which is yielded without
+            # splitting the column.
+            if ',' not in alt:
+                yield (chrom, pos, name, ref, alt, strand) + line_ids
+                continue
             for a in alt.split(','):
-                variants.append((chrom, pos, name, ref, a, strand))
+                yield (chrom, pos, name, ref, a, strand) + line_ids
 
     if reference_sequence and seq_context and output_NAs_to_file:
         with open(output_NAs_to_file, 'w') as file_handle:
             for na_row in na_rows:
                 file_handle.write(na_row)
-    return variants
+
+
+def read_vcf_file(input_path,
+                  strand_index=None,
+                  require_strand=False,
+                  output_NAs_to_file=None,
+                  seq_context=None,
+                  reference_sequence=None,
+                  line_numbers=False):
+    """
+    Read the relevant columns for a variant call format (VCF) file to
+    collect variants for variant effect prediction.
+
+    Parameters
+    ----------
+    input_path : str
+        Path to the VCF file.
+    strand_index : int or None, optional
+        Default is None. By default we assume the input sequence
+        surrounding a variant is on the forward strand. If your
+        model is strand-specific, you may specify a column number
+        (0-based) in the VCF file that includes strand information. Please
+        note that variant position, ref, and alt should still be specified
+        for the forward strand and Selene will apply reverse complement
+        to this variant.
+    require_strand : bool, optional
+        Default is False. Whether strand can be specified as '.'. If False,
+        Selene accepts strand value to be '+', '-', or '.' and automatically
+        treats '.' as '+'. If True, Selene skips any variant with strand '.'.
+        This parameter assumes that `strand_index` has been set.
+    output_NAs_to_file : str or None, optional
+        Default is None. Only used if `reference_sequence` and `seq_context`
+        are also not None. Specify a filepath to which invalid variants are
+        written. Invalid = sequences that cannot be fetched, either because
+        the exact chromosome cannot be found in the `reference_sequence` FASTA
+        file or because the sequence retrieved based on the specified
+        `seq_context` is out of bounds or overlapping with blacklist regions.
+    seq_context : int or tuple(int, int) or None, optional
+        Default is None. Only used if `reference_sequence` is not None.
+        Specifies the sequence context in which the variant is centered.
+        `seq_context` accepts a tuple of ints specifying the start and end
+        radius surrounding the variant position or a single int if the
+        start and end radius are the same length.
+    reference_sequence : selene_sdk.sequences.Genome or None, optional
+        Default is None. Only used if `seq_context` is not None.
+        The reference genome.
+    line_numbers : bool, optional
+        Default is False. If True, each variant also holds the (0-based)
+        number of the line in the VCF file it was read from, so that the
+        line can be written to the NA file if the variant's sequences
+        later turn out to be invalid.
+
+    Returns
+    -------
+    list(tuple)
+        List of variants. Tuple = (chrom, position, id, ref, alt, strand),
+        followed by the line number if `line_numbers` is True.
+
+    """
+    return list(iter_vcf_file(input_path,
+                              strand_index=strand_index,
+                              require_strand=require_strand,
+                              output_NAs_to_file=output_NAs_to_file,
+                              seq_context=seq_context,
+                              reference_sequence=reference_sequence,
+                              line_numbers=line_numbers))
 
 
 def _get_ref_idxs(seq_len, ref_len):
@@ -134,22 +244,120 @@ def _get_ref_idxs(seq_len, ref_len):
     return (start_pos, end_pos)
 
 
-def _process_alt(chrom,
-                 pos,
+def _get_deletion_flank_coords(pos, ref_len, alt_len, start, end):
+    """
+    Return the coordinates of the reference sequence on either side of a
+    deletion that are joined around the alt allele in the model input.
+
+    """
+    return ((start - ref_len // 2 + alt_len // 2, pos + 1),
+            (pos + 1 + ref_len,
+             end + (ref_len + 1) // 2 - (alt_len + 1) // 2))
+
+
+def _get_window_coords(ref, alt, start, end):
+    """
+    Return the coordinates of the reference sequence to fetch for a
+    variant: the model input window `[start, end)` and, for deletions, the
+    flanking bases that are shifted into the window to replace the
+    deleted ones.
+
+    """
+    ref_len = len(ref)
+    if alt == '*' or alt == '-':   # indicates a deletion
+        alt = ''
+    alt_len = len(alt)
+    if alt_len < ref_len:
+        return (start - ref_len // 2 + alt_len // 2,
+                end + (ref_len + 1) // 2 - (alt_len + 1) // 2)
+    return (start, end)
+
+
+def _fetch_window_pieces(get_sequence_from_coords,
+                         chrom,
+                         pos,
+                         ref,
+                         alt,
+                         start,
+                         end,
+                         base_index_lut,
+                         unk_base):
+    """
+    Fetch the window of the reference sequence for a variant (see
+    `_get_window_coords`) as the model input window and, for deletions,
+    the two flanking sequences, separately. Used when the window as a
+    whole cannot be fetched, e.g. because the bases between the pieces
+    overlap a blacklist region. The bases between the pieces are not used
+    and are left as unknown bases.
+
+    Returns
+    -------
+    tuple(str, numpy.ndarray, int) or None
+        The sequence of the window, its base indices and its start
+        coordinate, as returned by `_ReferenceWindowCache.get`, or None
+        if one of the pieces cannot be fetched.
+
+    """
+    window_start, window_end = _get_window_coords(ref, alt, start, end)
+    window_indices = np.full(window_end - window_start,
+                             base_index_lut[ord(unk_base)],
+                             dtype=np.uint8)
+    pieces = [(start, end)]
+    if alt == '*' or alt == '-':   # indicates a deletion
+        alt = ''
+    if len(alt) < len(ref):
+        pieces += _get_deletion_flank_coords(
+            pos, len(ref), len(alt), start, end)
+    for (piece_start, piece_end) in pieces:
+        if piece_end <= piece_start:
+            continue
+        sequence = get_sequence_from_coords(
+            chrom, piece_start, piece_end, pad=True)
+        if len(sequence) != piece_end - piece_start:
+            return None
+        window_indices[piece_start - window_start:piece_end - window_start] = \
+            _sequence_to_indices(sequence, base_index_lut)
+        if piece_start == start and piece_end == end:
+            wt_sequence = sequence
+    window = (unk_base * (start - window_start) + wt_sequence +
+              unk_base * (window_end - end))
+    return (window, window_indices, window_start)
+
+
+def _copy_spliced(out, pieces, skip=0):
+    """
+    Write the concatenation of `pieces`, from index `skip` onwards, into
+    `out` (until `out` is full), without building the concatenation.
+
+    """
+    i = 0
+    for piece in pieces:
+        if skip >= len(piece):
+            skip -= len(piece)
+            continue
+        piece = piece[skip:skip + len(out) - i]
+        skip = 0
+        out[i:i + len(piece)] = piece
+        i += len(piece)
+    return out
+
+
+def _process_alt(pos,
                  ref,
                  alt,
                  start,
                  end,
                  wt_sequence,
-                 reference_sequence):
+                 window,
+                 window_start,
+                 base_index_lut,
+                 out):
     """
-    Return the encoded sequence centered at a given allele for input into
-    the model.
+    Write the base indices of the sequence centered at a given allele
+    for input into the model into `out`.
 
     Parameters
     ----------
-    chrom : str
-        The chromosome the variant is in
     pos : int
         The position of the variant
     ref : str
@@ -161,108 +369,430 @@ def _process_alt(chrom,
     end : int
         The end coordinate for genome query
     wt_sequence : numpy.ndarray
-        The reference sequence encoding
-    reference_sequence : selene_sdk.sequences.Sequence
-        The reference sequence Selene queries to retrieve the model input
-        sequences based on variant coordinates.
+        The base indices of the reference sequence
+    window : numpy.ndarray
+        The base indices of the reference sequence (padded with unknown
+        bases where out of bounds) at the coordinates returned by
+        `_get_window_coords`.
+    window_start : int
+        The start coordinate of `window`.
+    base_index_lut : numpy.ndarray
+        The lookup table from character codes to base indices.
+    out : numpy.ndarray
+        The array, of the same length as `wt_sequence`, to which to write
+        the base indices of the sequence containing the alternate allele.
 
     Returns
     -------
-    list(numpy.ndarray)
-        A list of the encoded sequences containing alternate alleles at
-        the center
+    numpy.ndarray
+        `out`
 
     """
     if alt == '*' or alt == '-':   # indicates a deletion
         alt = ''
     ref_len = len(ref)
     alt_len = len(alt)
+    if ref_len == 1 and alt_len == 1 and alt.isascii():
+        # SNVs, most variants in a typical VCF, only replace the center base
+        out[:] = wt_sequence
+        out[_get_ref_idxs(len(wt_sequence), 1)[0]] = base_index_lut[ord(alt)]
+        return out
     if alt_len > len(wt_sequence):
-        sequence = _truncate_sequence(alt, len(wt_sequence))
-        return reference_sequence.sequence_to_encoding(
-            sequence)
+        out[:] = _sequence_to_indices(
+            _truncate_sequence(alt, len(wt_sequence)), base_index_lut)
+        return out
 
-    alt_encoding = reference_sequence.sequence_to_encoding(alt)
+    alt_indices = _sequence_to_indices(alt, base_index_lut)
     if ref_len == alt_len:  # substitution
         start_pos, end_pos = _get_ref_idxs(len(wt_sequence), ref_len)
-        sequence = np.vstack([wt_sequence[:start_pos, :],
-                              alt_encoding,
-                              wt_sequence[end_pos:, :]])
-        return sequence
+        return _copy_spliced(
+            out, (wt_sequence[:start_pos], alt_indices, wt_sequence[end_pos:]))
     elif alt_len > ref_len:  # insertion
         start_pos, end_pos = _get_ref_idxs(len(wt_sequence), ref_len)
-        sequence = np.vstack([wt_sequence[:start_pos, :],
-                              alt_encoding,
-                              wt_sequence[end_pos:, :]])
-        trunc_s = (len(sequence) - wt_sequence.shape[0]) // 2
-        trunc_e = trunc_s + wt_sequence.shape[0]
-        sequence = sequence[trunc_s:trunc_e, :]
-        return sequence
+        trunc_s = (alt_len - ref_len) // 2
+        return _copy_spliced(
+            out,
+            (wt_sequence[:start_pos], alt_indices, wt_sequence[end_pos:]),
+            skip=trunc_s)
     else:  # deletion
-        lhs = reference_sequence.get_sequence_from_coords(
-            chrom,
-            start - ref_len // 2 + alt_len // 2,
-            pos + 1,
-            pad=True)
-        rhs = reference_sequence.get_sequence_from_coords(
-            chrom,
-            pos + 1 + ref_len,
-            end + math.ceil(ref_len / 2.) - math.ceil(alt_len / 2.),
-            pad=True)
-        sequence = lhs + alt + rhs
-        return reference_sequence.sequence_to_encoding(
-            sequence)
-
-
-def _handle_standard_ref(ref_encoding,
-                         seq_encoding,
+        ((lhs_start, lhs_end), (rhs_start, rhs_end)) = \
+            _get_deletion_flank_coords(pos, ref_len, alt_len, start, end)
+        lhs = window[lhs_start - window_start:lhs_end - window_start]
+        rhs = window[rhs_start - window_start:rhs_end - window_start]
+        return _copy_spliced(out, (lhs, alt_indices, rhs))
+
+
+def _handle_standard_ref(ref_indices,
+                         sequence,
                          seq_length,
-                         reference_sequence):
-    ref_len = ref_encoding.shape[0]
+                         index_to_base):
+    ref_len = len(ref_indices)
 
     start_pos, end_pos = _get_ref_idxs(seq_length, ref_len)
 
-    sequence_encoding_at_ref = seq_encoding[
-        start_pos:start_pos + ref_len, :]
-    references_match = np.array_equal(
-        sequence_encoding_at_ref, ref_encoding)
+    sequence_at_ref = sequence[start_pos:start_pos + ref_len]
+    references_match = sequence_at_ref.tobytes() == ref_indices.tobytes()
 
-    sequence_at_ref = None
-    if not references_match:
-        sequence_at_ref = reference_sequence.encoding_to_sequence(
-            sequence_encoding_at_ref)
-        seq_encoding[start_pos:start_pos + ref_len, :] = \
-            ref_encoding
-    return references_match, seq_encoding, sequence_at_ref
+    if references_match:
+        return references_match, sequence, None
+    sequence_at_ref = ''.join(index_to_base[sequence_at_ref])
+    sequence[start_pos:start_pos + ref_len] = ref_indices
+    return references_match, sequence, sequence_at_ref
 
 
-def _handle_long_ref(ref_encoding,
-                     seq_encoding,
+def _handle_long_ref(ref_indices,
+                     sequence,
                      start_radius,
                      end_radius,
-                     reference_sequence):
-    ref_len = ref_encoding.shape[0]
-    sequence_encoding_at_ref = seq_encoding
+                     index_to_base):
+    ref_len = len(ref_indices)
     ref_start = ref_len // 2 - start_radius - 1
     ref_end = ref_len // 2 + end_radius - 1
-    ref_encoding = ref_encoding[ref_start:ref_end]
-    references_match = np.array_equal(
-        sequence_encoding_at_ref, ref_encoding)
+    ref_indices = ref_indices[ref_start:ref_end]
+    references_match = sequence.tobytes() == ref_indices.tobytes()
+
+    if references_match:
+        return references_match, sequence, None
+    sequence_at_ref = ''.join(index_to_base[sequence])
+    sequence[:] = ref_indices
+    return references_match, sequence, sequence_at_ref
+
 
-    sequence_at_ref = None
-    if not references_match:
-        sequence_at_ref = reference_sequence.encoding_to_sequence(
-            sequence_encoding_at_ref)
-        seq_encoding = ref_encoding
-    return references_match, seq_encoding, sequence_at_ref
+class _ReferenceWindowCache(object):
+    """
+    Fetches windows of the reference sequence, and their base indices,
+    for variant effect prediction. Sequence is fetched in chunks that
+    start at multiples of `chunk_size`, and the `max_chunks` most
+    recently used chunks are kept, so that variants close to each other
+    share a single fetch.
+
+    Parameters
+    ----------
+    get_sequence_from_coords : function
+        The reference sequence's `get_sequence_from_coords` method.
+    base_index_lut : numpy.ndarray
+        The lookup table from character codes to base indices.
+    chunk_size : int, optional
+        Default is 4096. A chunk covers (at least) the `chunk_size` bases
+        after its start and the following `chunk_size` bases, so that
+        windows that start in the former can be sliced from it.
+    max_chunks : int, optional
+        Default is 32. The number of chunks to keep.
+
+    """
+
+    def __init__(self,
+                 get_sequence_from_coords,
+                 base_index_lut,
+                 chunk_size=4096,
+                 max_chunks=32):
+        self._get_sequence_from_coords = get_sequence_from_coords
+        self._base_index_lut = base_index_lut
+        self._chunk_size = chunk_size
+        self._max_chunks = max_chunks
+        self._chunks = OrderedDict()
+
+    def get(self, chrom, start, end):
+        """
+        Get a window of the reference sequence that contains
+        `[start, end)`, padded with unknown bases where out of bounds.
+
+        Returns
+        -------
+        tuple(str, numpy.ndarray, int)
+            The sequence of the window, its base indices and its start
+            coordinate.
+
+        """
+        key = (chrom, start // self._chunk_size)
+        chunk = self._chunks.get(key)
+        if chunk is not None and chunk[2] + len(chunk[0]) >= end:
+            self._chunks.move_to_end(key)
+            return chunk
+        chunk_start = key[1] * self._chunk_size
+        chunk_end = max(chunk_start + 2 * self._chunk_size, end)
+        sequence = self._get_sequence_from_coords(
+            chrom, chunk_start, chunk_end, pad=True)
+        if len(sequence) != chunk_end - chunk_start:
+            # e.g. the chunk overlaps a blacklist region that the window
+            # does not overlap.
+            sequence = self._get_sequence_from_coords(
+                chrom, start, end, pad=True)
+            return (sequence,
+                    _sequence_to_indices(sequence, self._base_index_lut),
+                    start)
+        chunk = (sequence,
+                 _sequence_to_indices(sequence, self._base_index_lut),
+                 chunk_start)
+        self._chunks[key] = chunk
+        if len(self._chunks) > self._max_chunks:
+            self._chunks.popitem(last=False)
+        return chunk
+
+
+class _VariantBatchesDataset(IterableDataset):
+    """
+    Fetches the ref and alt sequences of variants for variant effect
+    prediction and yields them as base indices (see
+    `_sequence_to_indices`), in batches, for prediction with a
+    `torch.utils.data.DataLoader` (with `batch_size=None`). The one-hot
+    encoding is left to the caller, so that it can be done on the device
+    the model runs on.
+
+    Variants whose sequences cannot be fetched in full (e.g. the flanks
+    of a deletion overlap a blacklist region) are not predicted on, and
+    are passed along with the batches for the caller to write to the NA
+    file.
+
+    When the loader uses multiple worker processes, each worker is
+    assigned every `num_workers`-th run of `batch_size` consecutive
+    variants, so the loader returns the batches in the same order as
+    the variants.
+
+    Parameters
+    ----------
+    variants : list(tuple) or iterator
+        The variants, as returned by `read_vcf_file`. Must be a list if
+        the loader uses worker processes. Variants that are not predicted
+        on are passed along as they are, e.g. with their line numbers.
+    reference_sequence : selene_sdk.sequences.Genome
+        The reference genome.
+    sequence_length : int
+        The length of sequences that the model is expecting.
+    start_radius : int
+        The number of bases before the center of the ref allele in each
+        sequence.
+    end_radius : int
+        The number of bases after the center of the ref allele in each
+        sequence.
+    batch_size : int
+        The number of variants in each batch.
+    base_index_lut : numpy.ndarray
+        The lookup table from character codes to base indices (see
+        `_get_base_index_lut`).
+    complement_index_lut : numpy.ndarray or None, optional
+        Default is None. The complement of each base index (see
+        `_get_complement_index_lut`). If not None, the sequences of
+        variants on the '-' strand are reverse complemented.
+
+    """
+
+    def __init__(self,
+                 variants,
+                 reference_sequence,
+                 sequence_length,
+                 start_radius,
+                 end_radius,
+                 batch_size,
+                 base_index_lut,
+                 complement_index_lut=None):
+        super(_VariantBatchesDataset, self).__init__()
+        self.variants = variants
+        self.reference_sequence = reference_sequence
+        self.sequence_length = sequence_length
+        self.start_radius = start_radius
+        self.end_radius = end_radius
+        self.batch_size = batch_size
+        self.base_index_lut = base_index_lut
+        self.complement_index_lut = complement_index_lut
+
+    def _reverse_complement(self, batch_indices, ref_idx, batch_ids):
+        """
+        Take the reverse complement, in place, of the sequences of
+        variants on the '-' strand in a batch of :math:`U` unique ref
+        sequences followed by the :math:`B` alt sequences (as rows of
+        base indices in `batch_indices`).
+
+        Returns
+        -------
+        numpy.ndarray
+            `batch_indices`, of shape :math:`(U + B) \\times L`.
+
+        """
+        if self.complement_index_lut is not None:
+            reverse_alts = np.array([ids[5] == '-' for ids in batch_ids])
+            reverse = np.zeros(len(batch_indices), dtype=bool)
+            reverse[ref_idx] = reverse_alts
+            reverse[len(batch_indices) - len(batch_ids):] = reverse_alts
+            if reverse.any():
+                batch_indices[reverse] = self.complement_index_lut[
+                    batch_indices[reverse, ::-1]]
+        return batch_indices
+
+    def _get_batch(self,
+                   batch_indices,
+                   n_refs,
+                   ref_idx,
+                   batch_ids,
+                   genome_sequences,
+                   na_variants):
+        """
+        Copy the :math:`U` (`n_refs`) unique ref sequences and the
+        :math:`B` alt sequences of a batch out of the buffer.
+
+        Returns
+        -------
+        tuple(numpy.ndarray, numpy.ndarray, list(tuple), list(str or None), \
+        list(tuple))
+            The base indices of the ref sequences followed by the alt
+            sequences, of shape :math:`(U + B) \\times L`, the index of
+            the ref sequence of each alt, the identifiers of the
+            :math:`B` variants, the reference genome's sequence at the
+            ref of each variant whose ref does not match it (None for
+            the others), and the variants skipped since the previous
+            batch because their sequences could not be fetched.
+
+        """
+        n_variants = len(batch_ids)
+        batch_size = self.batch_size
+        ref_idx = ref_idx[:n_variants].copy()
+        return (self._reverse_complement(
+                    np.concatenate(
+                        (batch_indices[:n_refs],
+                         batch_indices[batch_size:batch_size + n_variants])),
+                    ref_idx,
+                    batch_ids),
+                ref_idx,
+                batch_ids,
+                genome_sequences,
+                na_variants)
+
+    def __iter__(self):
+        worker_id, num_workers = 0, 1
+        reference_sequence = self.reference_sequence
+        worker_info = get_worker_info()
+        if worker_info is not None:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+            # Each worker process opens its own handles to the reference
+            # genome files (see `Genome.__getstate__`).
+            reference_sequence = copy.deepcopy(reference_sequence)
+
+        # The attributes used for every variant are bound to locals.
+        batch_size = self.batch_size
+        sequence_length = self.sequence_length
+        start_radius = self.start_radius
+        end_radius = self.end_radius
+        base_index_lut = self.base_index_lut
+        unk_base = reference_sequence.UNK_BASE
+        # The reference sequence is fetched in windows shared by nearby
+        # variants (and by the alts of each variant, which are
+        # consecutive in `variants`), and the model inputs are sliced
+        # from them.
+        get_sequence_from_coords = reference_sequence.get_sequence_from_coords
+        get_window = _ReferenceWindowCache(
+            get_sequence_from_coords, base_index_lut).get
+        # The ref sequences of a batch are written to the first half of
+        # the rows of this buffer and the alt sequences to the second half.
+        # The alts of a variant are consecutive in `variants` and share
+        # a single ref row, which `ref_idx` maps each alt to.
+        batch_indices = np.empty((2 * batch_size, sequence_length),
+                                 dtype=np.uint8)
+        ref_idx = np.empty(batch_size, dtype=np.int64)
+        n_refs = 0
+        ref_key = None
+        batch_ids = []
+        genome_sequences = []
+        na_variants = []
+        index_to_base = np.append(reference_sequence.BASES_ARR, unk_base)
+        for i, variant in enumerate(self.variants):
+            if (i // batch_size) % num_workers != worker_id:
+                continue
+            chrom, pos, name, ref, alt, strand = variant[:6]
+            # A batch is made of one run of `batch_size` variants, less
+            # those that go to the NA file, so that the batches of the
+            # workers still interleave in order.
+            if i % batch_size == 0 and (batch_ids or na_variants):
+                yield self._get_batch(batch_indices, n_refs, ref_idx,
+                                      batch_ids, genome_sequences, na_variants)
+                n_refs = 0
+                batch_ids = []
+                genome_sequences = []
+                na_variants = []
+            # centers the sequence containing the ref allele based on the size
+            # of ref
+            center = pos + len(ref) // 2
+            start = center - start_radius
+            end = center + end_radius
+            window_coords = _get_window_coords(ref, alt, start, end)
+            window, window_indices, window_start = get_window(
+                chrom, *window_coords)
+            if window_start + len(window) < window_coords[1]:
+                pieces = _fetch_window_pieces(
+                    get_sequence_from_coords, chrom, pos, ref, alt,
+                    start, end, base_index_lut, unk_base)
+                if pieces is None:
+                    na_variants.append(variant)
+                    continue
+                window, window_indices, window_start = pieces
+            wt_sequence = window_indices[
+                start - window_start:end - window_start]
+            cursor = len(batch_ids)
+            _process_alt(
+                pos, ref, alt, start, end, wt_sequence,
+                window_indices, window_start, base_index_lut,
+                batch_indices[batch_size + cursor])
+
+            if (chrom, pos, ref, strand) != ref_key or not cursor:
+                ref_key = (chrom, pos, ref, strand)
+                # `str.find` searches the window in place, without
+                # copying the slice of it that is the model input.
+                contains_unk = window.find(
+                    unk_base, start - window_start, end - window_start) != -1
+                ref_sequence = batch_indices[n_refs]
+                ref_sequence[:] = wt_sequence
+                n_refs += 1
+
+                match = True
+                # The genome's sequence at the ref, if it does not match.
+                genome_sequence = None
+                ref_indices = _sequence_to_indices(ref, base_index_lut)
+                if len(ref) and len(ref) < sequence_length:
+                    (match, ref_sequence,
+                     genome_sequence) = _handle_standard_ref(
+                        ref_indices,
+                        ref_sequence,
+                        sequence_length,
+                        index_to_base)
+                elif len(ref) >= sequence_length:
+                    match, ref_sequence, genome_sequence = _handle_long_ref(
+                        ref_indices,
+                        ref_sequence,
+                        start_radius,
+                        end_radius,
+                        index_to_base)
+            ref_idx[cursor] = n_refs - 1
+            batch_ids.append((chrom, pos, name, ref, alt, strand, match, contains_unk))
+            genome_sequences.append(genome_sequence)
+
+        if batch_ids or na_variants:
+            yield self._get_batch(batch_indices, n_refs, ref_idx,
+                                  batch_ids, genome_sequences, na_variants)
+
+
+def _pin_batches(batches):
+    """
+    Copy the base indices of each batch from `_VariantBatchesDataset`
+    into page-locked memory, as a `torch.utils.data.DataLoader` with
+    `pin_memory=True` does, so that they can be copied to the GPU
+    asynchronously.
+
+    """
+    for (batch_indices, ref_idx, batch_ids, genome_sequences,
+            na_variants) in batches:
+        yield (torch.from_numpy(batch_indices).pin_memory(),
+               ref_idx,
+               batch_ids,
+               genome_sequences,
+               na_variants)
 
 
 def _handle_ref_alt_predictions(model,
-                                batch_ref_seqs,
-                                batch_alt_seqs,
+                                batch_ref_alt_seqs,
+                                ref_idx,
                                 batch_ids,
                                 reporters,
-                                use_cuda=False):
+                                use_cuda=False,
+                                precision="fp32"):
     """
     Helper method for variant effect prediction. Gets the model
     predictions and updates the reporters.
@@ -271,26 +801,65 @@ def _handle_ref_alt_predictions(model,
     ----------
     model : torch.nn.Sequential
         The model, on mode `eval`.
-    batch_ref_seqs : list(np.ndarray)
-        One-hot encoded sequences with the ref base(s).
-    batch_alt_seqs : list(np.ndarray)
-        One-hot encoded sequences with the alt base(s).
+    batch_ref_alt_seqs : numpy.ndarray or torch.Tensor
+        One-hot encoded sequences with the ref base(s) of the :math:`U`
+        unique refs in the batch, followed by the sequences with the alt
+        base(s), of shape :math:`(U + B) \\times N \\times L`.
+    ref_idx : numpy.ndarray or torch.Tensor
+        The index of the ref sequence of each of the :math:`B` alts.
+    batch_ids : list(tuple)
+        The identifiers of the :math:`B` variants in the batch.
     reporters : list(PredictionsHandler)
         List of prediction handlers.
     use_cuda : bool, optional
         Default is `False`. Specifies whether CUDA-enabled GPUs are available
         for torch to use.
+    precision : {'fp32', 'fp16', 'bf16'}, optional
+        Default is 'fp32'. The floating point precision in which to run the
+        model's forward pass.
+
+    Returns
+    -------
+    None
 
+    """
+    # The ref and alt sequences are run through the model as one batch,
+    # which halves the number of forward passes and host-device copies.
+    # Each ref is run once however many alts it has.
+    outputs = predict(model,
+                      batch_ref_alt_seqs,
+                      use_cuda=use_cuda,
+                      precision=precision,
+                      channels_first=True)
+    _report_ref_alt_predictions(outputs, ref_idx, batch_ids, reporters)
+
+
+def _report_ref_alt_predictions(outputs, ref_idx, batch_ids, reporters):
+    """
+    Pass the predictions for a batch from `_VariantBatchesDataset` to
+    each of the reporters: the predictions for the alts, along with the
+    predictions for their refs to the reporters that need them.
+
+    Parameters
+    ----------
+    outputs : numpy.ndarray
+        The predictions for the :math:`U` unique refs in the batch,
+        followed by the predictions for the :math:`B` alts.
+    ref_idx : numpy.ndarray or torch.Tensor
+        The index of the ref sequence of each of the :math:`B` alts.
+    batch_ids : list(tuple)
+        The identifiers of the :math:`B` variants in the batch.
+    reporters : list(PredictionsHandler)
+        List of prediction handlers.
 
     Returns
     -------
     None
 
     """
-    batch_ref_seqs = np.array(batch_ref_seqs)
-    batch_alt_seqs = np.array(batch_alt_seqs)
-    ref_outputs = predict(model, batch_ref_seqs, use_cuda=use_cuda)
-    alt_outputs = predict(model, batch_alt_seqs, use_cuda=use_cuda)
+    n_refs = len(outputs) - len(batch_ids)
+    ref_outputs = outputs[:n_refs][np.asarray(ref_idx)]
+    alt_outputs = outputs[n_refs:]
     for r in reporters:
         if r.needs_base_pred:
             r.handle_batch_predictions(alt_outputs, batch_ids, ref_outputs)
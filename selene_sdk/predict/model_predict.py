@@ -2,7 +2,7 @@
 This module provides the `AnalyzeSequences` class and supporting
 methods.
 """
-import math
+import logging
 import os
 from time import time
 import warnings
@@ -11,19 +11,29 @@ import numpy as np
 import pyfaidx
 import torch
 import torch.nn as nn
-
+from torch.utils.data import DataLoader
+
+from ._common import _FastaSequencesDataset
+from ._common import _PredictionsRing
+from ._common import _compile_model
+from ._common import _forward
+from ._common import _get_base_index_lut
+from ._common import _get_complement_index_lut
+from ._common import _get_encoding_table
+from ._common import _indices_to_encoding
 from ._common import _pad_sequence
+from ._common import _prefetch
+from ._common import _sequence_to_encoding
 from ._common import _truncate_sequence
 from ._common import get_reverse_complement
-from ._common import get_reverse_complement_encoding
 from ._common import predict
-from ._in_silico_mutagenesis import _ism_sample_id
+from ._common import PRECISION_DTYPES
+from ._in_silico_mutagenesis import _ism_sample_ids
 from ._in_silico_mutagenesis import in_silico_mutagenesis_sequences
-from ._in_silico_mutagenesis import mutate_sequence
-from ._variant_effect_prediction import _handle_long_ref
-from ._variant_effect_prediction import _handle_standard_ref
-from ._variant_effect_prediction import _handle_ref_alt_predictions
-from ._variant_effect_prediction import _process_alt
+from ._variant_effect_prediction import _pin_batches
+from ._variant_effect_prediction import _report_ref_alt_predictions
+from ._variant_effect_prediction import _VariantBatchesDataset
+from ._variant_effect_prediction import iter_vcf_file
 from ._variant_effect_prediction import read_vcf_file
 from .predict_handlers import AbsDiffScoreHandler
 from .predict_handlers import DiffScoreHandler
@@ -34,6 +44,11 @@ from ..sequences import Genome
 from ..utils import _is_lua_trained_model
 from ..utils import load_model_from_state_dict
 
+logger = logging.getLogger("selene")
+
+# The number of variants listed when logging unknown bases or reference
+# mismatches.
+N_LOGGED_EXAMPLES = 10
 
 # TODO: MAKE THESE GENERIC:
 ISM_COLS = ["pos", "ref", "alt"]
@@ -66,6 +81,19 @@ class AnalyzeSequences(object):
     use_cuda : bool, optional
         Default is `False`. Specifies whether CUDA-enabled GPUs are available
         for torch to use.
+    precision : {'fp32', 'fp16', 'bf16'}, optional
+        Default is 'fp32'. The floating point precision in which to run the
+        model's forward pass. 'fp16' and 'bf16' autocast the forward pass
+        to half precision, which is considerably faster on GPUs with
+        Tensor Cores, and are ignored if `use_cuda` is `False`.
+    compile_model : {None, 'trace', 'compile'}, optional
+        Default is `None`. Specify whether to compile the model for
+        inference after its weights are loaded: 'trace' traces it with
+        `torch.jit.trace` and 'compile' uses `torch.compile`. Compiling
+        fuses operations (e.g. convolution, batch norm and activation
+        chains) and can make the forward pass considerably faster, at the
+        cost of some startup time. Tracing requires a model whose forward
+        pass does not depend on its inputs' values.
     data_parallel : bool, optional
         Default is `False`. Specify whether multiple GPUs are available for
         torch to use during training.
@@ -90,9 +118,10 @@ class AnalyzeSequences(object):
         memory needed to actually carry out the operations (e.g. variant effect
         prediction) or load the model, so `write_mem_limit` should always be
         less than the total amount of CPU memory you have available on your
-        machine. For example, for variant effect prediction, we load all
-        the variants in 1 file into memory before getting the predictions, so
-        your machine must have enough memory to accommodate that. Another
+        machine. For example, for variant effect prediction, the variants
+        in a VCF file are read in batches rather than all at once, but the
+        batches that are queued for the model (more of them when
+        `num_workers` is greater than 0) still take up memory. Another
         possible consideration is your model size and whether you are
         using it on the CPU or a CUDA-enabled GPU (i.e. setting
         `use_cuda` to True).
@@ -109,6 +138,8 @@ class AnalyzeSequences(object):
         The names of the features that the model is predicting.
     use_cuda : bool
         Specifies whether to use a CUDA-enabled GPU or not.
+    precision : str
+        The floating point precision of the model's forward pass.
     data_parallel : bool
         Whether to use multiple GPUs or not.
     reference_sequence : class
@@ -125,7 +156,9 @@ class AnalyzeSequences(object):
                  use_cuda=False,
                  data_parallel=False,
                  reference_sequence=Genome,
-                 write_mem_limit=1500):
+                 write_mem_limit=1500,
+                 precision="fp32",
+                 compile_model=None):
         """
         Constructs a new `AnalyzeSequences` object.
         """
@@ -156,13 +189,17 @@ class AnalyzeSequences(object):
         self.model.eval()
 
         self.data_parallel = data_parallel
-        if self.data_parallel:
-            self.model = nn.DataParallel(model)
 
         self.use_cuda = use_cuda
         if self.use_cuda:
             self.model.cuda()
 
+        if precision not in PRECISION_DTYPES:
+            raise ValueError(
+                "`precision` must be one of {0}, but was '{1}'.".format(
+                    sorted(PRECISION_DTYPES), precision))
+        self.precision = precision
+
         self.sequence_length = sequence_length
 
         self._start_radius = sequence_length // 2
@@ -178,6 +215,31 @@ class AnalyzeSequences(object):
             Genome.update_bases_order(['A', 'G', 'C', 'T'])
         self._write_mem_limit = write_mem_limit
 
+        n_bases = len(self.reference_sequence.BASES_ARR)
+        self._base_index_lut = _get_base_index_lut(
+            self.reference_sequence.BASE_TO_INDEX, n_bases)
+        self._encoding_table = _get_encoding_table(n_bases)
+
+        if compile_model is not None:
+            if compile_model not in ("trace", "compile"):
+                raise ValueError(
+                    "`compile_model` must be one of None, 'trace' or "
+                    "'compile', but was '{0}'.".format(compile_model))
+            example_inputs = torch.zeros(
+                1, n_bases, sequence_length,
+                device="cuda" if self.use_cuda else "cpu")
+            if _is_lua_trained_model(self.model):
+                example_inputs = example_inputs.unsqueeze(2)
+            self.model = _compile_model(
+                self.model, compile_model, example_inputs)
+
+        # The model is wrapped last so that `DataParallel` replicates the
+        # model with its trained weights (and compiled, if requested).
+        if self.data_parallel:
+            from_lua = _is_lua_trained_model(self.model)
+            self.model = nn.DataParallel(self.model)
+            self.model.from_lua = from_lua
+
     def _initialize_reporters(self,
                               save_data,
                               output_path_prefix,
@@ -403,39 +465,53 @@ class AnalyzeSequences(object):
             ["index", "chrom", "start", "end", "strand", "contains_unk"],
             output_size=len(labels),
             mode="prediction")[0]
-        sequences = None
+        # Every row of `sequences` is overwritten before it is passed to
+        # the model, so the buffer is allocated once and reused. It is
+        # kept in the N x L layout the model takes.
+        sequences = np.empty((self.batch_size,
+                              len(self.reference_sequence.BASES_ARR),
+                              self.sequence_length),
+                             dtype=np.float32)
+        # As in `get_predictions_for_fasta_file`, a batch is reported
+        # only once the forward pass for the next batch has been queued.
+        ring = _PredictionsRing()
+        pending = None
         batch_ids = []
-        for i, (label, coords) in enumerate(zip(labels, seq_coords)):
+        for (i, (label, coords)) in enumerate(zip(labels, seq_coords)):
             encoding, contains_unk = self.reference_sequence.get_encoding_from_coords_check_unk(
                     *coords,
                     pad=True)
-            if sequences is None:
-                sequences = np.zeros((self.batch_size, *encoding.shape))
-            if i and i % self.batch_size == 0:
-                preds = predict(self.model, sequences, use_cuda=self.use_cuda)
-                sequences = np.zeros((self.batch_size, *encoding.shape))
-                reporter.handle_batch_predictions(preds, batch_ids)
-                batch_ids = []
+            sequences[len(batch_ids), :, :] = encoding.T
             batch_ids.append(label+(contains_unk,))
-            sequences[ i % self.batch_size, :, :] = encoding
             if contains_unk:
                 warnings.warn("For region {0}, "
                                 "reference sequence contains unknown base(s). "
                                 "--will be marked `True` in the `contains_unk` column "
                                 "of the .tsv or the row_labels .txt file.".format(
                                   label))
-
-        if (batch_ids and i == 0) or i % self.batch_size != 0:
-            sequences = sequences[:i % self.batch_size + 1, :, :]
-            preds = predict(self.model, sequences, use_cuda=self.use_cuda)
-            reporter.handle_batch_predictions(preds, batch_ids)
+            if len(batch_ids) == self.batch_size or i == len(labels) - 1:
+                outputs = _forward(self.model,
+                                   sequences[:len(batch_ids), :, :],
+                                   use_cuda=self.use_cuda,
+                                   precision=self.precision,
+                                   channels_first=True)
+                staged = (ring.stage(outputs), batch_ids)
+                if pending is not None:
+                    reporter.handle_batch_predictions(
+                        ring.collect(pending[0]), pending[1])
+                pending = staged
+                batch_ids = []
+        if pending is not None:
+            reporter.handle_batch_predictions(
+                ring.collect(pending[0]), pending[1])
 
         reporter.write_to_file()
 
     def get_predictions_for_fasta_file(self,
                                        input_path,
                                        output_dir,
-                                       output_format="tsv"):
+                                       output_format="tsv",
+                                       num_workers=0):
         """
         Get model predictions for sequences in a FASTA file.
 
@@ -468,6 +544,12 @@ class AnalyzeSequences(object):
                   output as a separate .txt file (should match the ordering
                   of the sequences in the input FASTA).
 
+        num_workers : int, optional
+            Default is 0. The number of worker processes that read and
+            encode the sequences in the FASTA file while the model makes
+            predictions. If 0, the sequences are read on a background thread
+            of the main process.
+
         Returns
         -------
         None
@@ -480,46 +562,60 @@ class AnalyzeSequences(object):
         output_prefix = '.'.join(filename.split('.')[:-1])
 
         fasta_file = pyfaidx.Fasta(input_path)
+        n_sequences = len(fasta_file.keys())
+        fasta_file.close()
         reporter = self._initialize_reporters(
             ["predictions"],
             os.path.join(output_dir, output_prefix),
             output_format,
             ["index", "name"],
-            output_size=len(fasta_file.keys()),
+            output_size=n_sequences,
             mode="prediction")[0]
-        sequences = np.zeros((self.batch_size,
-                              self.sequence_length,
-                              len(self.reference_sequence.BASES_ARR)))
-        batch_ids = []
-        for i, fasta_record in enumerate(fasta_file):
-            cur_sequence = str(fasta_record)
-
-            if len(cur_sequence) < self.sequence_length:
-                cur_sequence = _pad_sequence(cur_sequence,
-                                             self.sequence_length,
-                                             self.reference_sequence.UNK_BASE)
-            elif len(cur_sequence) > self.sequence_length:
-                cur_sequence = _truncate_sequence(cur_sequence, self.sequence_length)
-
-            cur_sequence_encoding = self.reference_sequence.sequence_to_encoding(
-                cur_sequence)
-
-            if i and i > 0 and i % self.batch_size == 0:
-                preds = predict(self.model, sequences, use_cuda=self.use_cuda)
-                sequences = np.zeros(
-                    (self.batch_size, *cur_sequence_encoding.shape))
-                reporter.handle_batch_predictions(preds, batch_ids)
-                batch_ids = []
-
-            batch_ids.append([i, fasta_record.name])
-            sequences[i % self.batch_size, :, :] = cur_sequence_encoding
 
-        if (batch_ids and i == 0) or i % self.batch_size != 0:
-            sequences = sequences[:i % self.batch_size + 1, :, :]
-            preds = predict(self.model, sequences, use_cuda=self.use_cuda)
-            reporter.handle_batch_predictions(preds, batch_ids)
+        # The batches are one-hot encoded on the device the model runs
+        # on, directly in the N x L layout the model takes.
+        device = torch.device("cuda" if self.use_cuda else "cpu")
+        encoding_table_t = torch.from_numpy(
+            self._encoding_table.T.copy()).to(device)
+        dataset = _FastaSequencesDataset(
+            input_path,
+            self.sequence_length,
+            self.batch_size,
+            self._base_index_lut,
+            self.reference_sequence.UNK_BASE)
+        loader_kwargs = {}
+        if num_workers > 0:
+            loader_kwargs["prefetch_factor"] = 4
+        loader = DataLoader(dataset,
+                            batch_size=self.batch_size,
+                            num_workers=num_workers,
+                            pin_memory=self.use_cuda,
+                            **loader_kwargs)
+        if num_workers == 0:
+            # The next batch is read on a background thread while the
+            # model runs on the current one.
+            loader = _prefetch(loader)
+        # The predictions for each batch are handed to the reporter only
+        # after the forward pass for the next batch has been queued, so
+        # that copying them off the GPU does not stall it.
+        ring = _PredictionsRing()
+        pending = None
+        for (indices, names, sequence_indices) in loader:
+            sequences = _indices_to_encoding(
+                sequence_indices.to(device, non_blocking=True),
+                encoding_table_t)
+            outputs = _forward(self.model, sequences, use_cuda=self.use_cuda,
+                               precision=self.precision, channels_first=True)
+            staged = (ring.stage(outputs),
+                      list(zip(indices.tolist(), names)))
+            if pending is not None:
+                reporter.handle_batch_predictions(
+                    ring.collect(pending[0]), pending[1])
+            pending = staged
+        if pending is not None:
+            reporter.handle_batch_predictions(
+                ring.collect(pending[0]), pending[1])
 
-        fasta_file.close()
         reporter.write_to_file()
 
 
@@ -527,7 +623,8 @@ class AnalyzeSequences(object):
                         input_path,
                         output_dir,
                         output_format="tsv",
-                        strand_index=None):
+                        strand_index=None,
+                        num_workers=0):
         """
         Get model predictions for sequences specified in a FASTA or BED file.
 
@@ -566,6 +663,11 @@ class AnalyzeSequences(object):
             information (strand must be one of {'+', '-', '.'}). Specify
             the index (0-based) to use it. Otherwise, by default '+' is used.
             (This parameter is ignored if FASTA file is used as input.)
+        num_workers : int, optional
+            Default is 0. The number of worker processes that read and
+            encode the sequences in the FASTA file while the model makes
+            predictions. (This parameter is ignored if BED file is used as
+            input.)
 
         Returns
         -------
@@ -578,7 +680,10 @@ class AnalyzeSequences(object):
         """
         if input_path.endswith('.fa') or input_path.endswith('.fasta'):
             self.get_predictions_for_fasta_file(
-                input_path, output_dir, output_format=output_format)
+                input_path,
+                output_dir,
+                output_format=output_format,
+                num_workers=num_workers)
         else:
             self.get_predictions_for_bed_file(
                 input_path,
@@ -602,11 +707,12 @@ class AnalyzeSequences(object):
             The sequence to mutate.
         base_preds : numpy.ndarray
             The model's prediction for `sequence`.
-        mutations_list : list(list(tuple))
-            The mutations to apply to the sequence. Each element in
-            `mutations_list` is a list of tuples, where each tuple
-            specifies the `int` position in the sequence to mutate and what
-            `str` base to which the position is mutated (e.g. (1, 'A')).
+        mutations_list : tuple(numpy.ndarray, numpy.ndarray)
+            The mutations to apply to the sequence, as returned by
+            `in_silico_mutagenesis_sequences`: a pair of :math:`M \\times n`
+            arrays holding the positions in the sequence to mutate and the
+            indices (in `self.reference_sequence.BASES_ARR`) of the bases to
+            which those positions are mutated.
         reporters : list(PredictionsHandler)
             The list of reporters, where each reporter handles the predictions
             made for each mutated sequence. Will collect, compute scores
@@ -621,34 +727,90 @@ class AnalyzeSequences(object):
             `reporters`.
 
         """
-        current_sequence_encoding = self.reference_sequence.sequence_to_encoding(
-            sequence)
-        for i in range(0, len(mutations_list), self.batch_size):
+        positions, alt_indices = mutations_list
+        bases_arr = np.asarray(self.reference_sequence.BASES_ARR)
+        sequence_arr = np.array(list(sequence))
+
+        # Mutated sequences are assembled on the device the model runs
+        # on, directly in the N x L layout the model takes: each batch is
+        # a copy of the reference encoding with the encodings of the
+        # alternate bases written into the mutated columns.
+        device = torch.device("cuda" if self.use_cuda else "cpu")
+        encoding_table = torch.from_numpy(self._encoding_table).to(device)
+        ref_encoding = torch.from_numpy(_sequence_to_encoding(
+            sequence, self._base_index_lut, self._encoding_table).T.copy()
+        ).to(device)
+        # The mutations are kept in their compact dtypes (int32 positions,
+        # uint8 base indices) and only widened to index tensors per batch.
+        positions_tensor = torch.from_numpy(
+            np.ascontiguousarray(positions, dtype=np.int32)).to(device)
+        alt_indices_tensor = torch.from_numpy(
+            np.ascontiguousarray(alt_indices, dtype=np.uint8)).to(device)
+        # If none of the reporters need the raw predictions, only their
+        # differences from `base_preds` are computed (on the device) and
+        # reported.
+        base_preds_tensor = None
+        if not any(r.requires_raw_outputs for r in reporters):
+            base_preds_tensor = torch.from_numpy(
+                np.asarray(base_preds, dtype=np.float32)).to(device)
+        # As in `get_predictions_for_fasta_file`, a batch is reported
+        # only once the forward pass for the next batch has been queued.
+        ring = _PredictionsRing()
+        pending = None
+        for i in range(0, len(positions), self.batch_size):
             start = i
-            end = min(i + self.batch_size, len(mutations_list))
-
-            mutated_sequences = np.zeros(
-                (end - start, *current_sequence_encoding.shape))
-
-            batch_ids = []
-            for ix, mutation_info in enumerate(mutations_list[start:end]):
-                mutated_seq = mutate_sequence(
-                    current_sequence_encoding, mutation_info,
-                    reference_sequence=self.reference_sequence)
-                mutated_sequences[ix, :, :] = mutated_seq
-                batch_ids.append(_ism_sample_id(sequence, mutation_info))
-            outputs = predict(
-                self.model, mutated_sequences, use_cuda=self.use_cuda)
-
-            for r in reporters:
-                if r.needs_base_pred:
-                    r.handle_batch_predictions(outputs, batch_ids, base_preds)
-                else:
-                    r.handle_batch_predictions(outputs, batch_ids)
+            end = min(i + self.batch_size, len(positions))
+
+            batch_rows = torch.arange(end - start, device=device).unsqueeze(1)
+            mutated_sequences = ref_encoding.expand(
+                end - start, -1, -1).clone()
+            mutated_sequences[
+                batch_rows, :, positions_tensor[start:end].long()] = \
+                encoding_table[alt_indices_tensor[start:end].long()]
+
+            outputs = _forward(
+                self.model, mutated_sequences, use_cuda=self.use_cuda,
+                precision=self.precision, channels_first=True)
+            if base_preds_tensor is not None:
+                outputs = outputs.float() - base_preds_tensor
+            staged = ring.stage(outputs)
+
+            if pending is not None:
+                self._report_ism_batch(ring.collect(pending[0]), pending[1],
+                                       base_preds, reporters,
+                                       base_preds_tensor is not None)
+            batch_ids = _ism_sample_ids(
+                sequence_arr, bases_arr, positions[start:end],
+                alt_indices[start:end])
+            pending = (staged, batch_ids)
+        if pending is not None:
+            self._report_ism_batch(ring.collect(pending[0]), pending[1],
+                                   base_preds, reporters,
+                                   base_preds_tensor is not None)
 
         for r in reporters:
             r.write_to_file()
 
+    def _report_ism_batch(self,
+                          outputs,
+                          batch_ids,
+                          base_preds,
+                          reporters,
+                          outputs_are_diffs=False):
+        """
+        Pass the predictions for a batch of mutated sequences to each of
+        the reporters, along with the reference prediction for the
+        reporters that need it. If `outputs_are_diffs`, `outputs` holds
+        the differences between the predictions and `base_preds` instead.
+        """
+        for r in reporters:
+            if outputs_are_diffs:
+                r.handle_batch_diffs(outputs, batch_ids)
+            elif r.needs_base_pred:
+                r.handle_batch_predictions(outputs, batch_ids, base_preds)
+            else:
+                r.handle_batch_predictions(outputs, batch_ids)
+
     def in_silico_mutagenesis(self,
                               sequence,
                               save_data,
@@ -736,20 +898,14 @@ class AnalyzeSequences(object):
         if path_dirs:
             os.makedirs(path_dirs, exist_ok=True)
 
-        n = len(sequence)
-        if n < self.sequence_length: # Pad string length as necessary.
-             diff = (self.sequence_length - n) / 2
-             pad_l = int(np.floor(diff))
-             pad_r = math.ceil(diff)
-             sequence = ((self.reference_sequence.UNK_BASE * pad_l) +
-                         sequence +
-                         (self.reference_sequence.UNK_BASE * pad_r))
-        elif n > self.sequence_length:  # Extract center substring of proper length.
-            start = int((n - self.sequence_length) // 2)
-            end = int(start + self.sequence_length)
-            sequence = sequence[start:end]
-
-        sequence = str.upper(sequence)
+        if len(sequence) < self.sequence_length:
+            sequence = _pad_sequence(sequence,
+                                     self.sequence_length,
+                                     self.reference_sequence.UNK_BASE)
+        elif len(sequence) > self.sequence_length:
+            sequence = _truncate_sequence(sequence, self.sequence_length)
+        else:
+            sequence = str.upper(sequence)
         mutated_sequences = in_silico_mutagenesis_sequences(
             sequence, mutate_n_bases=1,
             reference_sequence=self.reference_sequence,
@@ -760,15 +916,16 @@ class AnalyzeSequences(object):
             output_path_prefix,
             output_format,
             ISM_COLS,
-            output_size=len(mutated_sequences))
+            output_size=len(mutated_sequences[0]))
 
-        current_sequence_encoding = \
-            self.reference_sequence.sequence_to_encoding(sequence)
+        current_sequence_encoding = _sequence_to_encoding(
+            sequence, self._base_index_lut, self._encoding_table)
 
         current_sequence_encoding = current_sequence_encoding.reshape(
             (1, *current_sequence_encoding.shape))
         base_preds = predict(
-            self.model, current_sequence_encoding, use_cuda=self.use_cuda)
+            self.model, current_sequence_encoding, use_cuda=self.use_cuda,
+            precision=self.precision)
 
         if "predictions" in save_data and output_format == 'hdf5':
             ref_reporter = self._initialize_reporters(
@@ -889,6 +1046,10 @@ class AnalyzeSequences(object):
 
         os.makedirs(output_dir, exist_ok=True)
 
+        # The reporters are created for the first sequence and `reset` to
+        # write to a new set of files for each sequence after that.
+        reporters = None
+        ref_reporter = None
         fasta_file = pyfaidx.Fasta(input_path)
         for i, fasta_record in enumerate(fasta_file):
             cur_sequence = str.upper(str(fasta_record))
@@ -907,12 +1068,13 @@ class AnalyzeSequences(object):
                 reference_sequence=self.reference_sequence,
                 start_position=start_position,
                 end_position=end_position)
-            cur_sequence_encoding = self.reference_sequence.sequence_to_encoding(
-                cur_sequence)
+            cur_sequence_encoding = _sequence_to_encoding(
+                cur_sequence, self._base_index_lut, self._encoding_table)
             base_encoding = cur_sequence_encoding.reshape(
                 1, *cur_sequence_encoding.shape)
             base_preds = predict(
-                self.model, base_encoding, use_cuda=self.use_cuda)
+                self.model, base_encoding, use_cuda=self.use_cuda,
+                precision=self.precision)
 
             file_prefix = None
             if use_sequence_name:
@@ -922,18 +1084,26 @@ class AnalyzeSequences(object):
                 file_prefix = os.path.join(
                     output_dir, str(i))
             # Write base to file, and make mut preds.
-            reporters = self._initialize_reporters(
-                save_data,
-                file_prefix,
-                output_format,
-                ISM_COLS,
-                output_size=len(mutated_sequences))
+            if reporters is None:
+                reporters = self._initialize_reporters(
+                    save_data,
+                    file_prefix,
+                    output_format,
+                    ISM_COLS,
+                    output_size=len(mutated_sequences[0]))
+            else:
+                for r in reporters:
+                    r.reset(file_prefix, output_size=len(mutated_sequences[0]))
 
             if "predictions" in save_data and output_format == 'hdf5':
-                ref_reporter = self._initialize_reporters(
-                    ["predictions"],
-                    "{0}_ref".format(file_prefix),
-                    output_format, ["name"], output_size=1)[0]
+                if ref_reporter is None:
+                    ref_reporter = self._initialize_reporters(
+                        ["predictions"],
+                        "{0}_ref".format(file_prefix),
+                        output_format, ["name"], output_size=1)[0]
+                else:
+                    ref_reporter.reset(
+                        "{0}_ref".format(file_prefix), output_size=1)
                 ref_reporter.handle_batch_predictions(
                     base_preds, [["input_sequence"]])
                 ref_reporter.write_to_file()
@@ -952,7 +1122,8 @@ class AnalyzeSequences(object):
                                   output_dir=None,
                                   output_format="tsv",
                                   strand_index=None,
-                                  require_strand=False):
+                                  require_strand=False,
+                                  num_workers=0):
         """
         Get model predictions and scores for a list of variants.
 
@@ -998,6 +1169,12 @@ class AnalyzeSequences(object):
             Selene accepts strand value to be '+', '-', or '.' and automatically
             treats '.' as '+'. If True, Selene skips any variant with strand '.'.
             This parameter assumes that `strand_index` has been set.
+        num_workers : int, optional
+            Default is 0. The number of worker processes that fetch and
+            encode the sequences for the variants while the model makes
+            predictions. If 0, this is done on a background thread of the
+            main process. If greater than 0, the VCF file is read in full
+            before predictions start.
 
         Returns
         -------
@@ -1029,110 +1206,144 @@ class AnalyzeSequences(object):
             output_dir = path
 
         output_path_prefix = os.path.join(output_dir, output_path_prefix)
-        variants = read_vcf_file(
-            vcf_file,
+        vcf_kwargs = dict(
             strand_index=strand_index,
             require_strand=require_strand,
             output_NAs_to_file="{0}.NA".format(output_path_prefix),
             seq_context=(self._start_radius, self._end_radius),
-            reference_sequence=self.reference_sequence)
+            reference_sequence=self.reference_sequence,
+            line_numbers=True)
+        # The variants are streamed from the VCF, except for HDF5 output,
+        # which needs the number of variants up front, and for worker
+        # processes, which each go through the list of variants.
+        output_size = None
+        if output_format == "hdf5" or num_workers > 0:
+            variants = read_vcf_file(vcf_file, **vcf_kwargs)
+            output_size = len(variants)
+        else:
+            variants = iter_vcf_file(vcf_file, **vcf_kwargs)
         reporters = self._initialize_reporters(
             save_data,
             output_path_prefix,
             output_format,
             VARIANTEFFECT_COLS,
-            output_size=len(variants),
+            output_size=output_size,
             mode="varianteffect")
 
-        batch_ref_seqs = []
-        batch_alt_seqs = []
-        batch_ids = []
+        complement_index_lut = None
+        if strand_index is not None:
+            complement_index_lut = _get_complement_index_lut(
+                self.reference_sequence.BASES_ARR,
+                self.reference_sequence.COMPLEMENTARY_BASE_DICT)
+        dataset = _VariantBatchesDataset(variants,
+                                         self.reference_sequence,
+                                         self.sequence_length,
+                                         self._start_radius,
+                                         self._end_radius,
+                                         self.batch_size,
+                                         self._base_index_lut,
+                                         complement_index_lut)
+        if num_workers > 0:
+            batches = DataLoader(dataset,
+                                 batch_size=None,
+                                 num_workers=num_workers,
+                                 pin_memory=self.use_cuda,
+                                 prefetch_factor=4)
+        else:
+            # The next batch is assembled (and pinned) on a background
+            # thread while the model runs on the current one.
+            batches = dataset
+            if self.use_cuda:
+                batches = _pin_batches(batches)
+            batches = _prefetch(batches)
+        # The batches are one-hot encoded on the device the model runs
+        # on, directly in the N x L layout the model takes, so only their
+        # base indices are copied to it.
+        device = torch.device("cuda" if self.use_cuda else "cpu")
+        encoding_table_t = torch.from_numpy(
+            self._encoding_table.T.copy()).to(device)
+        n_variants = 0
+        na_variants = []
+        # Variants whose reference contains unknown bases or does not
+        # match the genome are logged once, after the last batch.
+        n_unk = 0
+        n_mismatches = 0
+        unk_variants = []
+        mismatch_variants = []
+        # As in `get_predictions_for_fasta_file`, a batch is reported
+        # only once the forward pass for the next batch has been queued.
+        ring = _PredictionsRing()
+        pending = None
         t_i = time()
-        for ix, (chrom, pos, name, ref, alt, strand) in enumerate(variants):
-            # centers the sequence containing the ref allele based on the size
-            # of ref
-            center = pos + len(ref) // 2
-            start = center - self._start_radius
-            end = center + self._end_radius
-            ref_sequence_encoding, contains_unk = \
-                self.reference_sequence.get_encoding_from_coords_check_unk(
-                    chrom, start, end)
-
-            ref_encoding = self.reference_sequence.sequence_to_encoding(ref)
-            alt_sequence_encoding = _process_alt(
-                chrom, pos, ref, alt, start, end,
-                ref_sequence_encoding,
-                self.reference_sequence)
-
-            match = True
-            seq_at_ref = None
-            if len(ref) and len(ref) < self.sequence_length:
-                match, ref_sequence_encoding, seq_at_ref = _handle_standard_ref(
-                    ref_encoding,
-                    ref_sequence_encoding,
-                    self.sequence_length,
-                    self.reference_sequence)
-            elif len(ref) >= self.sequence_length:
-                match, ref_sequence_encoding, seq_at_ref = _handle_long_ref(
-                    ref_encoding,
-                    ref_sequence_encoding,
-                    self._start_radius,
-                    self._end_radius,
-                    self.reference_sequence)
-
-            if contains_unk:
-                warnings.warn("For variant ({0}, {1}, {2}, {3}, {4}, {5}), "
-                           "reference sequence contains unknown base(s)"
-                           "--will be marked `True` in the `contains_unk` column "
-                           "of the .tsv or the row_labels .txt file.".format(
-                             chrom, pos, name, ref, alt, strand))
-            if not match:
-                warnings.warn("For variant ({0}, {1}, {2}, {3}, {4}, {5}), "
-                              "reference does not match the reference genome. "
-                              "Reference genome contains {6} instead. "
-                              "Predictions/scores associated with this "
-                              "variant--where we use '{3}' in the input "
-                              "sequence--will be marked `False` in the `ref_match` "
-                              "column of the .tsv or the row_labels .txt file".format(
-                                  chrom, pos, name, ref, alt, strand, seq_at_ref))
-            batch_ids.append((chrom, pos, name, ref, alt, strand, match, contains_unk))
-            if strand == '-':
-                ref_sequence_encoding = get_reverse_complement_encoding(
-                    ref_sequence_encoding,
-                    self.reference_sequence.BASES_ARR,
-                    self.reference_sequence.COMPLEMENTARY_BASE_DICT)
-                alt_sequence_encoding = get_reverse_complement_encoding(
-                    alt_sequence_encoding,
-                    self.reference_sequence.BASES_ARR,
-                    self.reference_sequence.COMPLEMENTARY_BASE_DICT)
-            batch_ref_seqs.append(ref_sequence_encoding)
-            batch_alt_seqs.append(alt_sequence_encoding)
-
-            if len(batch_ref_seqs) >= self.batch_size:
-                _handle_ref_alt_predictions(
-                    self.model,
-                    batch_ref_seqs,
-                    batch_alt_seqs,
-                    batch_ids,
-                    reporters,
-                    use_cuda=self.use_cuda)
-                batch_ref_seqs = []
-                batch_alt_seqs = []
-                batch_ids = []
-
-            if ix and ix % 10000 == 0:
+        for (batch_indices, ref_idx, batch_ids, genome_sequences,
+                batch_na_variants) in batches:
+            na_variants += batch_na_variants
+            if not batch_ids:
+                continue
+            for (ids, genome_sequence) in zip(batch_ids, genome_sequences):
+                if ids[7]:
+                    n_unk += 1
+                    if len(unk_variants) < N_LOGGED_EXAMPLES:
+                        unk_variants.append(ids[:6])
+                if not ids[6]:
+                    n_mismatches += 1
+                    if len(mismatch_variants) < N_LOGGED_EXAMPLES:
+                        mismatch_variants.append(
+                            ids[:6] + (genome_sequence,))
+            batch_ref_alt_seqs = _indices_to_encoding(
+                torch.as_tensor(batch_indices).to(device, non_blocking=True),
+                encoding_table_t)
+            # The ref and alt sequences are run through the model as one
+            # batch. Each ref is run once however many alts it has.
+            outputs = _forward(self.model,
+                               batch_ref_alt_seqs,
+                               use_cuda=self.use_cuda,
+                               precision=self.precision,
+                               channels_first=True)
+            staged = (ring.stage(outputs), ref_idx, batch_ids)
+            if pending is not None:
+                _report_ref_alt_predictions(
+                    ring.collect(pending[0]), pending[1], pending[2],
+                    reporters)
+            pending = staged
+            n_steps = n_variants // 10000
+            n_variants += len(batch_ids)
+            if n_variants // 10000 > n_steps:
                 print("[STEP {0}]: {1} s to process 10000 variants.".format(
-                    ix, time() - t_i))
+                    n_variants, time() - t_i))
                 t_i = time()
-
-        if batch_ref_seqs:
-            _handle_ref_alt_predictions(
-                self.model,
-                batch_ref_seqs,
-                batch_alt_seqs,
-                batch_ids,
-                reporters,
-                use_cuda=self.use_cuda)
+        if pending is not None:
+            _report_ref_alt_predictions(
+                ring.collect(pending[0]), pending[1], pending[2], reporters)
+
+        if n_unk:
+            logger.warning(
+                "For %d variant(s), the reference sequence contains unknown "
+                "base(s)--these are marked `True` in the `contains_unk` "
+                "column of the .tsv or the row_labels .txt file. "
+                "First (chrom, pos, name, ref, alt, strand): %s",
+                n_unk, unk_variants)
+        if n_mismatches:
+            logger.warning(
+                "For %d variant(s), the reference does not match the "
+                "reference genome. Predictions/scores associated with these "
+                "variants--where we use the reference in the VCF in the "
+                "input sequence--are marked `False` in the `ref_match` "
+                "column of the .tsv or the row_labels .txt file. "
+                "First (chrom, pos, name, ref, alt, strand, reference "
+                "genome sequence at ref): %s",
+                n_mismatches, mismatch_variants)
+
+        # The lines of the variants whose sequences could not be fetched
+        # are added, unchanged and once per line, to those `iter_vcf_file`
+        # wrote to the NA file.
+        if na_variants:
+            na_line_numbers = set(variant[6] for variant in na_variants)
+            with open(vcf_file, 'r') as vcf_handle, \
+                    open(vcf_kwargs["output_NAs_to_file"], 'a') as na_handle:
+                for line_number, line in enumerate(vcf_handle):
+                    if line_number in na_line_numbers:
+                        na_handle.write(line)
 
         for r in reporters:
-            r.write_to_file()
+            r.close()
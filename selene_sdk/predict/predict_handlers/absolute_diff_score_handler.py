@@ -35,7 +35,8 @@ class AbsDiffScoreHandler(PredictionsHandler):
     write_mem_limit : int, optional
         Default is 1500. Specify the amount of memory you can allocate to
         storing model predictions/scores for this particular handler, in MB.
-        Handler will write to file whenever this memory limit is reached.
+        Handler will write to file whenever half of this memory limit is
+        reached (see `PredictionsHandler`).
     write_labels : bool, optional
         Default is True. If you initialize multiple write handlers for the
         same set of inputs with output format `hdf5`, set `write_label` to
@@ -47,6 +48,10 @@ class AbsDiffScoreHandler(PredictionsHandler):
     needs_base_pred : bool
         Whether the handler needs the base (reference) prediction as input
         to compute the final output
+    requires_raw_outputs : bool
+        Whether the handler needs the raw model predictions, or only
+        their difference from the base prediction (see
+        `handle_batch_diffs`)
 
     """
 
@@ -70,6 +75,7 @@ class AbsDiffScoreHandler(PredictionsHandler):
             write_mem_limit=write_mem_limit,
             write_labels=write_labels)
         self.needs_base_pred = True
+        self.requires_raw_outputs = False
         self._results = []
         self._samples = []
 
@@ -112,11 +118,35 @@ class AbsDiffScoreHandler(PredictionsHandler):
             features).
 
         """
-        absolute_diffs = np.abs(baseline_predictions - batch_predictions)
-        self._results.append(absolute_diffs)
+        self.handle_batch_diffs(
+            baseline_predictions - batch_predictions, batch_ids)
+
+    def handle_batch_diffs(self, batch_diffs, batch_ids):
+        """
+        Handles the differences between the model predictions for a batch
+        of sequences and the baseline prediction, when these have already
+        been computed (e.g. on the GPU, before the predictions are copied
+        to the host).
+
+        Parameters
+        ----------
+        batch_diffs : arraylike
+            The differences between the predictions for a batch of
+            sequences and the baseline prediction. This should have
+            dimensions of :math:`B \\times N` (where :math:`B` is the
+            size of the mini-batch and :math:`N` is the number of
+            features).
+        batch_ids : list(arraylike)
+            Batch of sequence identifiers. Each element is `arraylike`
+            because it may contain more than one column (written to
+            file) that together make up a unique identifier for a
+            sequence.
+
+        """
+        self._results.append(np.abs(batch_diffs))
         self._samples.append(batch_ids)
         if self._reached_mem_limit():
-            self.write_to_file()
+            self._write_in_background()
 
     def write_to_file(self):
         """
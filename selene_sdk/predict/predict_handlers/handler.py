@@ -6,6 +6,7 @@ output them according to a user-specified output format.
 """
 from abc import ABCMeta
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import os
 from sys import getsizeof
 
@@ -33,7 +34,7 @@ def write_to_tsv_file(data_across_features, info_cols, output_filepath):
         Filepath to which to write outputs
 
     """
-    with open(output_filepath, 'a') as output_handle:
+    with open(output_filepath, 'a', buffering=2**20) as output_handle:
         for info_batch, preds_batch in zip(info_cols, data_across_features):
             for info, preds in zip(info_batch, preds_batch):
                 preds_str = '\t'.join(
@@ -145,7 +146,9 @@ class PredictionsHandler(metaclass=ABCMeta):
     write_mem_limit : int, optional
         Default is 1500. Specify the amount of memory you can allocate to
         storing model predictions/scores for this particular handler, in MB.
-        Handler will write to file whenever this memory limit is reached.
+        Handler will write to file whenever half of this memory limit is
+        reached, so that the results being written in the background and
+        those accumulated in the meantime stay within the limit.
     write_labels : bool, optional
         Default is True. If you initialize multiple write handlers for the
         same set of inputs with output format `hdf5`, set `write_label` to
@@ -157,6 +160,10 @@ class PredictionsHandler(metaclass=ABCMeta):
     needs_base_pred : bool
         Whether the handler needs the base (reference) prediction as input
         to compute the final output
+    requires_raw_outputs : bool
+        Whether the handler needs the raw model predictions, or only
+        their difference from the base prediction (see
+        `handle_batch_diffs`)
 
     """
     def __init__(self,
@@ -168,6 +175,7 @@ class PredictionsHandler(metaclass=ABCMeta):
                  write_mem_limit=1500,
                  write_labels=True):
         self.needs_base_pred = False
+        self.requires_raw_outputs = True
         self._results = []
         self._samples = []
 
@@ -183,6 +191,8 @@ class PredictionsHandler(metaclass=ABCMeta):
         self._output_filepath = None
         self._labels_filepath = None
         self._hdf5_start_index = None
+        self._writer = None
+        self._pending_write = None
 
         self._write_mem_limit = write_mem_limit
         self._write_labels = write_labels
@@ -192,6 +202,7 @@ class PredictionsHandler(metaclass=ABCMeta):
         Initialize handlers for writing outputs to file.
 
         """
+        self._handler_filename = handler_filename
         output_path = None
         filename_prefix = None
         if not os.path.isdir(self._output_path_prefix):
@@ -215,6 +226,7 @@ class PredictionsHandler(metaclass=ABCMeta):
                 output_handle.create_dataset(
                     "data",
                     (self._output_size, len(self._features)),
+                    maxshape=(None, len(self._features)),
                     dtype='float64')
             self._hdf5_start_index = 0
 
@@ -230,14 +242,17 @@ class PredictionsHandler(metaclass=ABCMeta):
                     filename_prefix, labels_filename)
             self._labels_filepath = os.path.join(output_path, labels_filename)
             # create the file
-            label_handle = open(self._labels_filepath, 'w+')
-            label_handle.write("{0}\n".format(
-                                '\t'.join(self._columns_for_ids)))
+            with open(self._labels_filepath, 'w+') as label_handle:
+                label_handle.write("{0}\n".format(
+                    '\t'.join(self._columns_for_ids)))
 
     def _reached_mem_limit(self):
+        # Results accumulate while the previous ones are being written
+        # (see `_write_in_background`), so each write takes at most half
+        # of the limit.
         mem_used = (self._results[0].nbytes * len(self._results) +
                     getsizeof(self._samples[0]) * len(self._samples))
-        return mem_used / 10**6 >= self._write_mem_limit
+        return mem_used / 10**6 >= self._write_mem_limit / 2
 
     @abstractmethod
     def handle_batch_predictions(self, *args, **kwargs):
@@ -246,23 +261,104 @@ class PredictionsHandler(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
-    def write_to_file(self):
+    def reset(self, output_path_prefix, output_size=None):
         """
-        Writes accumulated handler results to file.
+        Writes any accumulated results to file and points the handler at
+        a new set of output files, so that the same handler can be reused
+        for several inputs (e.g. the sequences in a FASTA file).
+
+        Parameters
+        ----------
+        output_path_prefix : str
+            Path to the new output files. The path may contain a filename
+            prefix. Selene will append a handler-specific name to the end
+            of the path/prefix.
+        output_size : int or None, optional
+            Default is None. The total number of rows in the new output.
+            Must be specified when the output_format is hdf5.
+
+        """
+        self.write_to_file()
+        self._output_path_prefix = output_path_prefix
+        self._output_size = output_size
+        if self._output_format == 'hdf5' and output_size is None:
+            raise ValueError("`output_size` must be specified when "
+                             "`output_format` is 'hdf5'.")
+        self._labels_filepath = None
+        self._hdf5_start_index = None
+        self._create_write_handler(self._handler_filename)
+
+    def _write_in_background(self):
+        """
+        Hands the accumulated results to a background thread that writes
+        them to file, so that the predictions for the next batches do not
+        wait on the disk. Waits for the previous write, if any, to finish
+        first, so that at most one set of results is being written.
 
         """
         if not self._results:
-            return None
+            return
+        self._wait_for_write()
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1)
+        results, samples = self._results, self._samples
+        self._results = []
+        self._samples = []
         if self._hdf5_start_index is not None:
-            self._hdf5_start_index = write_to_hdf5_file(
-                self._results,
-                self._samples,
+            start_index = self._hdf5_start_index
+            self._hdf5_start_index += sum(r.shape[0] for r in results)
+            self._pending_write = self._writer.submit(
+                write_to_hdf5_file,
+                results,
+                samples,
                 self._output_filepath,
-                self._hdf5_start_index,
+                start_index,
                 info_filepath=self._labels_filepath)
         else:
-            write_to_tsv_file(self._results,
-                              self._samples,
-                              self._output_filepath)
-        self._results = []
-        self._samples = []
+            self._pending_write = self._writer.submit(
+                write_to_tsv_file,
+                results,
+                samples,
+                self._output_filepath)
+
+    def _wait_for_write(self):
+        if self._pending_write is not None:
+            pending_write, self._pending_write = self._pending_write, None
+            pending_write.result()
+
+    def write_to_file(self):
+        """
+        Writes accumulated handler results to file.
+
+        """
+        try:
+            self._write_in_background()
+            self._wait_for_write()
+        except Exception:
+            # An error raised by a write is raised here, after which the
+            # writer thread is still shut down.
+            self._shutdown_writer()
+            raise
+
+    def _shutdown_writer(self):
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
+
+    def close(self):
+        """
+        Writes accumulated handler results to file and finalizes the
+        output. Call once no more results will be handled. An HDF5 output
+        with fewer rows written than `output_size` (e.g. variants that
+        went to the NA file after `output_size` was set) is trimmed to
+        the rows written.
+
+        """
+        try:
+            self.write_to_file()
+        finally:
+            self._shutdown_writer()
+        if (self._hdf5_start_index is not None and
+                self._hdf5_start_index < self._output_size):
+            with h5py.File(self._output_filepath, 'a') as output_handle:
+                output_handle["data"].resize(self._hdf5_start_index, axis=0)
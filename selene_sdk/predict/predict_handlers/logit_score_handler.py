@@ -40,7 +40,8 @@ class LogitScoreHandler(PredictionsHandler):
     write_mem_limit : int, optional
         Default is 1500. Specify the amount of memory you can allocate to
         storing model predictions/scores for this particular handler, in MB.
-        Handler will write to file whenever this memory limit is reached.
+        Handler will write to file whenever half of this memory limit is
+        reached (see `PredictionsHandler`).
     write_labels : bool, optional
         Default is True. If you initialize multiple write handlers for the
         same set of inputs with output format `hdf5`, set `write_label` to
@@ -125,7 +126,7 @@ class LogitScoreHandler(PredictionsHandler):
         self._results.append(logits)
         self._samples.append(batch_ids)
         if self._reached_mem_limit():
-            self.write_to_file()
+            self._write_in_background()
 
     def write_to_file(self):
         """
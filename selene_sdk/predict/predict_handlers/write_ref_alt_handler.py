@@ -7,6 +7,17 @@ from .handler import PredictionsHandler
 from .write_predictions_handler import WritePredictionsHandler
 
 
+def _get_ref_alt_filepaths(output_path_prefix):
+    output_path, prefix = os.path.split(output_path_prefix)
+    ref_filename = "ref"
+    alt_filename = "alt"
+    if len(prefix) > 0:
+        ref_filename = "{0}.{1}".format(prefix, ref_filename)
+        alt_filename = "{0}.{1}".format(prefix, alt_filename)
+    return (os.path.join(output_path, ref_filename),
+            os.path.join(output_path, alt_filename))
+
+
 class WriteRefAltHandler(PredictionsHandler):
     """
     Used during variant effect prediction. This handler records the
@@ -37,7 +48,8 @@ class WriteRefAltHandler(PredictionsHandler):
     write_mem_limit : int, optional
         Default is 1500. Specify the amount of memory you can allocate to
         storing model predictions/scores for this particular handler, in MB.
-        Handler will write to file whenever this memory limit is reached.
+        Handler will write to file whenever half of this memory limit is
+        reached (see `PredictionsHandler`).
     write_labels : bool, optional
         Default is True. If you initialize multiple write handlers for the
         same set of inputs with output format `hdf5`, set `write_label` to
@@ -80,14 +92,8 @@ class WriteRefAltHandler(PredictionsHandler):
         self._write_mem_limit = write_mem_limit
         self._write_labels = write_labels
 
-        output_path, prefix = os.path.split(output_path_prefix)
-        ref_filename = "ref"
-        alt_filename = "alt"
-        if len(prefix) > 0:
-            ref_filename = "{0}.{1}".format(prefix, ref_filename)
-            alt_filename = "{0}.{1}".format(prefix, alt_filename)
-        ref_filepath = os.path.join(output_path, ref_filename)
-        alt_filepath = os.path.join(output_path, alt_filename)
+        ref_filepath, alt_filepath = _get_ref_alt_filepaths(
+            output_path_prefix)
 
         self._ref_writer = WritePredictionsHandler(
             features,
@@ -138,6 +144,28 @@ class WriteRefAltHandler(PredictionsHandler):
         self._alt_writer.handle_batch_predictions(
             batch_predictions, batch_ids)
 
+    def reset(self, output_path_prefix, output_size=None):
+        """
+        Writes any stored predictions to file and points the handler at
+        a new pair of ref and alt output files.
+
+        Parameters
+        ----------
+        output_path_prefix : str
+            Path to the new output files. The path may contain a filename
+            prefix.
+        output_size : int or None, optional
+            Default is None. The total number of rows in the new output.
+            Must be specified when the output_format is hdf5.
+
+        """
+        self._output_path_prefix = output_path_prefix
+        self._output_size = output_size
+        ref_filepath, alt_filepath = _get_ref_alt_filepaths(
+            output_path_prefix)
+        self._ref_writer.reset(ref_filepath, output_size=output_size)
+        self._alt_writer.reset(alt_filepath, output_size=output_size)
+
     def write_to_file(self):
         """
         Writes the stored scores to 2 files (1 for ref, 1 for alt).
@@ -145,3 +173,12 @@ class WriteRefAltHandler(PredictionsHandler):
         """
         self._ref_writer.write_to_file()
         self._alt_writer.write_to_file()
+
+    def close(self):
+        """
+        Writes the stored scores to the ref and alt files and finalizes
+        them (see `PredictionsHandler.close`).
+
+        """
+        self._ref_writer.close()
+        self._alt_writer.close()
@@ -0,0 +1,236 @@
+"""
+Test methods in the _variant_effect_prediction module
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+
+from selene_sdk.predict._common import _get_base_index_lut
+from selene_sdk.predict._common import _sequence_to_indices
+from selene_sdk.predict._variant_effect_prediction import _ReferenceWindowCache
+from selene_sdk.predict._variant_effect_prediction import \
+    _VariantBatchesDataset
+from selene_sdk.predict._variant_effect_prediction import \
+    _handle_ref_alt_predictions
+from selene_sdk.predict._variant_effect_prediction import _process_alt
+from selene_sdk.predict._variant_effect_prediction import read_vcf_file
+from selene_sdk.sequences import Genome
+
+
+class TestReferenceWindowCache(unittest.TestCase):
+
+    def setUp(self):
+        self.chrom_sequence = "ACGTacgtNNACGTTGCA" * 10
+        self.base_index_lut = _get_base_index_lut(Genome.BASE_TO_INDEX, 4)
+        self.queries = []
+
+    def _padded_sequence(self, start, end):
+        sequence = self.chrom_sequence[max(start, 0):end]
+        return ("N" * max(-start, 0) + sequence +
+                "N" * max(end - len(self.chrom_sequence), 0))
+
+    def _get_sequence_from_coords(self, chrom, start, end, pad=False):
+        self.queries.append((chrom, start, end))
+        if end > 150 and start < 160:  # overlaps a blacklist region
+            return ""
+        return self._padded_sequence(start, end)
+
+    def _assert_window(self, cache, start, end):
+        sequence, indices, window_start = cache.get("chr1", start, end)
+        self.assertLessEqual(window_start, start)
+        offset = start - window_start
+        expected = self._padded_sequence(start, end)
+        self.assertEqual(sequence[offset:offset + end - start], expected)
+        self.assertEqual(
+            indices[offset:offset + end - start].tolist(),
+            self.base_index_lut[
+                np.frombuffer(expected.encode(), np.uint8)].tolist())
+
+    def test_nearby_windows_share_a_fetch(self):
+        cache = _ReferenceWindowCache(
+            self._get_sequence_from_coords, self.base_index_lut,
+            chunk_size=16, max_chunks=2)
+        for (start, end) in [(-4, 6), (3, 13), (10, 20), (15, 31)]:
+            self._assert_window(cache, start, end)
+        self.assertEqual(self.queries[0], ("chr1", -16, 16))
+        self.assertEqual(self.queries[1], ("chr1", 0, 32))
+        self.assertEqual(len(self.queries), 2)
+
+    def test_long_window_and_fallback(self):
+        cache = _ReferenceWindowCache(
+            self._get_sequence_from_coords, self.base_index_lut,
+            chunk_size=16, max_chunks=2)
+        self._assert_window(cache, 20, 100)
+        self.assertEqual(self.queries[0], ("chr1", 16, 100))
+        # The chunk at [144, 176) overlaps the blacklist but the window
+        # does not.
+        self._assert_window(cache, 146, 149)
+        self.assertEqual(self.queries[1:],
+                         [("chr1", 144, 176), ("chr1", 146, 149)])
+
+
+class TestProcessAlt(unittest.TestCase):
+
+    def setUp(self):
+        self.base_index_lut = _get_base_index_lut(Genome.BASE_TO_INDEX, 4)
+        # The window for a deletion of the 1-base ref 'G' at position 10,
+        # for a sequence of length 5 at [8, 13).
+        self.window = _sequence_to_indices("ACGTAC", self.base_index_lut)
+        self.wt_sequence = self.window[:5].copy()
+
+    def _process_alt(self, alt):
+        out = _process_alt(10, 'G', alt, 8, 13, self.wt_sequence,
+                           self.window, 8, self.base_index_lut,
+                           np.empty(5, dtype=np.uint8))
+        return ''.join(np.append(Genome.BASES_ARR, 'N')[out])
+
+    def test_snv(self):
+        self.assertEqual(self._process_alt('T'), "ACTTA")
+        self.assertEqual(self._process_alt('t'), "ACTTA")
+        self.assertEqual(self._process_alt('N'), "ACNTA")
+        self.assertEqual(self.wt_sequence.tolist(),
+                         self.window[:5].tolist())
+
+    def test_insertion(self):
+        self.assertEqual(self._process_alt('GT'), "ACGTT")
+
+    def test_deletion(self):
+        self.assertEqual(self._process_alt('-'), "ACGAC")
+        self.assertEqual(self._process_alt('*'), "ACGAC")
+
+
+class TestVariantBatchesDatasetBlacklist(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # chr1 ends shortly after the start of the hg19 blacklist region
+        # chr1:564449-570371 and chr4 shortly after chr4:9987-12694.
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        random_state = np.random.RandomState(0)
+        cls.chrom_sequences = {
+            "chr1": ''.join(random_state.choice(list("ACGT"), 564600)),
+            "chr4": ''.join(random_state.choice(list("ACGT"), 13100)),
+        }
+        fasta_path = os.path.join(cls.tmp_dir.name, "genome.fa")
+        with open(fasta_path, 'w') as fasta_handle:
+            for (chrom, sequence) in cls.chrom_sequences.items():
+                fasta_handle.write(">{0}\n".format(chrom))
+                for i in range(0, len(sequence), 60):
+                    fasta_handle.write(sequence[i:i + 60] + "\n")
+        cls.genome = Genome(fasta_path, blacklist_regions="hg19")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def _get_batches(self, variants):
+        dataset = _VariantBatchesDataset(
+            variants, self.genome, 100, 50, 50, 4,
+            _get_base_index_lut(Genome.BASE_TO_INDEX, 4))
+        return list(dataset)
+
+    def _to_sequence(self, indices):
+        return ''.join(np.append(Genome.BASES_ARR, 'N')[indices])
+
+    def test_deletion_next_to_blacklist(self):
+        # The flanks of the deletion end right before the blacklist
+        # region, but the bases past the alt-sized flank overlap it.
+        chrom_sequence = self.chrom_sequences["chr1"]
+        pos = 564397
+        ref = chrom_sequence[pos - 1:pos + 2]
+        ((batch_indices, ref_idx, batch_ids, genome_sequences,
+          na_variants),) = \
+            self._get_batches(
+            [("chr1", pos, "v1", ref, "A", "+")])
+        start = pos + 1 - 50
+        end = pos + 1 + 50
+        self.assertEqual(self._to_sequence(batch_indices[0]),
+                         chrom_sequence[start:end])
+        self.assertEqual(self._to_sequence(batch_indices[1]),
+                         chrom_sequence[start - 1:pos + 1] + "A" +
+                         chrom_sequence[pos + 4:end + 1])
+        self.assertEqual(ref_idx.tolist(), [0])
+        self.assertEqual(batch_ids[0][6:], (True, False))
+        self.assertEqual(genome_sequences, [None])
+        self.assertEqual(na_variants, [])
+
+    def test_deletion_overlapping_blacklist_goes_to_NA(self):
+        chrom_sequence = self.chrom_sequences["chr1"]
+        pos = 564397
+        ref = chrom_sequence[pos - 1:pos + 2]
+        # The variants that go to the NA file keep their line numbers.
+        snv = ("chr1", pos - 100, "v1", chrom_sequence[pos - 101], "A", "+",
+               1)
+        deletion = ("chr1", pos, "v2", ref, "-", "+", 2)
+        batches = self._get_batches([snv, deletion] + [snv] * 4)
+        self.assertEqual([len(b[2]) for b in batches], [3, 2])
+        self.assertEqual([b[0].shape for b in batches],
+                         [(4, 100), (3, 100)])
+        self.assertEqual(batches[0][4], [deletion])
+        self.assertEqual(batches[1][4], [])
+
+    def test_long_deletion_over_blacklist(self):
+        # The deleted bases between the model input window and the right
+        # flank overlap the blacklist region, the flanks do not.
+        chrom_sequence = self.chrom_sequences["chr4"]
+        pos = 6000
+        ref = chrom_sequence[pos - 1:pos + 6999]
+        ((batch_indices, ref_idx, batch_ids, genome_sequences,
+          na_variants),) = \
+            self._get_batches(
+            [("chr4", pos, "v1", ref, "A", "+")])
+        start = pos + 3500 - 50
+        end = pos + 3500 + 50
+        self.assertEqual(self._to_sequence(batch_indices[1]),
+                         chrom_sequence[start - 3500:pos + 1] + "A" +
+                         chrom_sequence[pos + 7001:end + 3499])
+        self.assertFalse(batch_ids[0][7])
+        # The ref does not match the genome as the window is shorter than
+        # the ref, and the genome's sequence is kept for the log.
+        self.assertFalse(batch_ids[0][6])
+        self.assertEqual(genome_sequences, [chrom_sequence[start:end]])
+
+    def test_read_vcf_file_line_numbers(self):
+        vcf_path = os.path.join(self.tmp_dir.name, "variants.vcf")
+        with open(vcf_path, 'w') as vcf_handle:
+            vcf_handle.write("##fileformat=VCFv4.2\n"
+                             "#CHROM\tPOS\tID\tREF\tALT\n"
+                             "1\t100\tv1\tA\tC\n"
+                             "1\t200\tv2\tTTG\t-,*\textra\n")
+        variants = read_vcf_file(vcf_path,
+                                 reference_sequence=self.genome,
+                                 line_numbers=True)
+        self.assertEqual(variants,
+                         [("chr1", 100, "v1", "A", "C", "+", 2),
+                          ("chr1", 200, "v2", "TTG", "-", "+", 3),
+                          ("chr1", 200, "v2", "TTG", "*", "+", 3)])
+
+
+class _RecordingReporter(object):
+    needs_base_pred = True
+
+    def handle_batch_predictions(self, predictions, batch_ids, base_preds):
+        self.args = (predictions, batch_ids, base_preds)
+
+
+class TestHandleRefAltPredictions(unittest.TestCase):
+
+    def test_ref_predictions_are_gathered_per_alt(self):
+        model = torch.nn.Flatten()
+        # 2 unique refs followed by 3 alts, the first 2 sharing a ref
+        sequences = np.arange(10, dtype=np.float32).reshape(5, 2, 1)
+        reporter = _RecordingReporter()
+        _handle_ref_alt_predictions(
+            model, sequences, np.array([0, 0, 1]), ["a", "b", "c"],
+            [reporter])
+        predictions, batch_ids, base_preds = reporter.args
+        self.assertEqual(predictions.tolist(), [[4, 5], [6, 7], [8, 9]])
+        self.assertEqual(base_preds.tolist(), [[0, 1], [0, 1], [2, 3]])
+        self.assertEqual(batch_ids, ["a", "b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,25 @@
+import os
+import tempfile
 import unittest
 
+import numpy as np
+import torch
+import torch.nn as nn
+
+from selene_sdk.predict import AnalyzeSequences
+from selene_sdk.predict._common import _get_base_index_lut
+from selene_sdk.predict._common import _get_encoding_table
+from selene_sdk.predict._common import _sequence_to_encoding
+from selene_sdk.predict._in_silico_mutagenesis import _ism_sample_ids
 from selene_sdk.predict.model_predict import in_silico_mutagenesis_sequences
+from selene_sdk.sequences import Genome
+
+
+def _to_mutation_lists(mutations, bases_arr):
+    positions, alt_indices = mutations
+    return [[(int(p), bases_arr[a]) for (p, a) in zip(pos_row, alt_row)]
+            for (pos_row, alt_row) in zip(positions, alt_indices)]
+
 
 class TestModelPredict(unittest.TestCase):
 
@@ -10,7 +29,8 @@ class TestModelPredict(unittest.TestCase):
         self.input_sequence = "ATCCG"
 
     def test_in_silico_muta_sequences_single(self):
-        observed = in_silico_mutagenesis_sequences("ATCCG")
+        observed = _to_mutation_lists(
+            in_silico_mutagenesis_sequences("ATCCG"), self.bases_arr)
         expected = [
             (0, 'C'), (0, 'G'), (0, 'T'),
             (1, 'A'), (1, 'C'), (1, 'G'),
@@ -22,7 +42,10 @@ class TestModelPredict(unittest.TestCase):
         self.assertListEqual(observed, expected_lists)
 
     def test_in_silico_muta_sequences_single_subset_positions(self):
-        observed = in_silico_mutagenesis_sequences("ATCCG", start_position=1, end_position=4)
+        observed = _to_mutation_lists(
+            in_silico_mutagenesis_sequences(
+                "ATCCG", start_position=1, end_position=4),
+            self.bases_arr)
         expected = [
             (1, 'A'), (1, 'C'), (1, 'G'),
             (2, 'A'), (2, 'G'), (2, 'T'),
@@ -32,8 +55,10 @@ class TestModelPredict(unittest.TestCase):
         self.assertListEqual(observed, expected_lists)
 
     def test_in_silico_muta_sequences_double(self):
-        observed = in_silico_mutagenesis_sequences(
-            "ATC", mutate_n_bases=2, start_position=0, end_position=3)
+        observed = _to_mutation_lists(
+            in_silico_mutagenesis_sequences(
+                "ATC", mutate_n_bases=2, start_position=0, end_position=3),
+            self.bases_arr)
         expected = [
             [(0, 'C'), (1, 'A')], [(0, 'G'), (1, 'A')], [(0, 'T'), (1, 'A')],
             [(0, 'C'), (1, 'C')], [(0, 'G'), (1, 'C')], [(0, 'T'), (1, 'C')],
@@ -50,8 +75,10 @@ class TestModelPredict(unittest.TestCase):
         self.assertCountEqual(observed, expected)
 
     def test_in_silico_muta_sequences_double_subset_positions(self):
-        observed = in_silico_mutagenesis_sequences(
-            "ATCG", mutate_n_bases=2, start_position=1, end_position=3)
+        observed = _to_mutation_lists(
+            in_silico_mutagenesis_sequences(
+                "ATCG", mutate_n_bases=2, start_position=1, end_position=3),
+            self.bases_arr)
         expected = [
             [(1, 'A'), (2, 'A')], [(1, 'C'), (2, 'A')], [(1, 'G'), (2, 'A')],
             [(1, 'A'), (2, 'G')], [(1, 'C'), (2, 'G')], [(1, 'G'), (2, 'G')],
@@ -59,6 +86,123 @@ class TestModelPredict(unittest.TestCase):
         ]
         self.assertCountEqual(observed, expected)
 
+    def test_in_silico_muta_sequences_unknown_base(self):
+        observed = _to_mutation_lists(
+            in_silico_mutagenesis_sequences("ANC", start_position=1, end_position=2),
+            self.bases_arr)
+        expected = [[(1, 'A')], [(1, 'C')], [(1, 'G')], [(1, 'T')]]
+        self.assertListEqual(observed, expected)
+
+    def test_ism_sample_ids_double(self):
+        positions, alt_indices = in_silico_mutagenesis_sequences(
+            "ATC", mutate_n_bases=2, start_position=0, end_position=2)
+        observed = _ism_sample_ids(
+            np.array(list("ATC")), np.array(self.bases_arr),
+            positions[:2], alt_indices[:2])
+        expected = [["0;1", "A;T", "C;A"], ["0;1", "A;T", "C;C"]]
+        self.assertListEqual(observed.tolist(), expected)
+
+    def test_sequence_to_encoding_lookup_table(self):
+        base_to_index = dict(self.bases_encoding)
+        base_to_index.update({b.lower(): i for (b, i) in self.bases_encoding.items()})
+        observed = _sequence_to_encoding(
+            "AcNgT", _get_base_index_lut(base_to_index, 4), _get_encoding_table(4))
+        expected = np.array([[1., 0., 0., 0.],
+                             [0., 1., 0., 0.],
+                             [.25, .25, .25, .25],
+                             [0., 0., 1., 0.],
+                             [0., 0., 0., 1.]])
+        self.assertEqual(observed.dtype, np.float32)
+        self.assertTrue(np.array_equal(observed, expected))
+
+
+class TestAnalyzeSequences(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+        torch.manual_seed(0)
+        self.model = nn.Sequential(
+            nn.Flatten(), nn.Linear(40, 3), nn.Sigmoid())
+        self.model_path = os.path.join(self.output_dir, "model.pth")
+        torch.save(self.model.state_dict(), self.model_path)
+        self.genome = Genome("selene_sdk/sequences/tests/files/small.fasta")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _analyze_sequences(self, batch_size=4):
+        return AnalyzeSequences(self.model,
+                                self.model_path,
+                                10,
+                                ["f1", "f2", "f3"],
+                                batch_size=batch_size,
+                                reference_sequence=self.genome)
+
+    def _write_input(self, filename, lines):
+        input_path = os.path.join(self.output_dir, filename)
+        with open(input_path, 'w') as input_handle:
+            input_handle.write("".join(lines))
+        return input_path
+
+    def _read_tsv(self, output_path):
+        with open(output_path, 'r') as output_handle:
+            return [line.rstrip('\n').split('\t') for line in output_handle]
+
+    def test_bed_file_partial_last_batch(self):
+        input_path = self._write_input(
+            "regions.bed",
+            ["chr2\t{0}\t{1}\n".format(20 + 10 * i, 30 + 10 * i)
+             for i in range(5)])
+        rows = {}
+        for batch_size in (4, 1):
+            output_dir = os.path.join(self.output_dir, str(batch_size))
+            os.makedirs(output_dir)
+            self._analyze_sequences(batch_size).get_predictions_for_bed_file(
+                input_path, output_dir)
+            rows[batch_size] = self._read_tsv(
+                os.path.join(output_dir, "regions_predictions.tsv"))
+        self.assertEqual(
+            rows[4][0],
+            ["index", "chrom", "start", "end", "strand", "contains_unk",
+             "f1", "f2", "f3"])
+        self.assertEqual([row[0] for row in rows[4][1:]],
+                         [str(i) for i in range(5)])
+        self.assertEqual(rows[4], rows[1])
+
+    def test_fasta_file_partial_last_batch(self):
+        sequences = ["ACGTACGTAC", "ACG", "ACGTACGTACGTACGTACGT", "ttttt",
+                     "GGGGCCCCAAAATTTT"]
+        input_path = self._write_input(
+            "sequences.fa",
+            [">seq{0}\n{1}\n".format(i, sequence)
+             for (i, sequence) in enumerate(sequences)])
+        rows = {}
+        for (batch_size, num_workers) in ((4, 0), (4, 2), (1, 0)):
+            output_dir = os.path.join(
+                self.output_dir, "{0}_{1}".format(batch_size, num_workers))
+            self._analyze_sequences(batch_size).get_predictions_for_fasta_file(
+                input_path, output_dir, num_workers=num_workers)
+            rows[(batch_size, num_workers)] = self._read_tsv(
+                os.path.join(output_dir, "sequences_predictions.tsv"))
+        self.assertEqual(len(rows[(4, 0)]), len(sequences) + 1)
+        self.assertEqual([row[:2] for row in rows[(4, 0)][1:]],
+                         [[str(i), "seq{0}".format(i)] for i in range(5)])
+        self.assertEqual(rows[(4, 0)], rows[(1, 0)])
+        self.assertEqual(rows[(4, 2)], rows[(1, 0)])
+
+    def test_bed_file_only_invalid_regions(self):
+        lines = ["chr9\t10\t20\n", "chr2\t95\t105\n", "chr2\tx\t20\n"]
+        input_path = self._write_input("regions.bed", lines)
+        self._analyze_sequences().get_predictions_for_bed_file(
+            input_path, self.output_dir)
+        self.assertEqual(
+            len(self._read_tsv(
+                os.path.join(self.output_dir, "regions_predictions.tsv"))),
+            1)
+        with open(os.path.join(self.output_dir, "regions.NA")) as na_handle:
+            self.assertEqual(na_handle.readlines(), lines)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,204 @@
+"""
+Test the prediction handlers' output files
+"""
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+from selene_sdk.predict.predict_handlers import WritePredictionsHandler
+from selene_sdk.predict.predict_handlers import WriteRefAltHandler
+from selene_sdk.predict.predict_handlers.handler import \
+    probabilities_to_string
+
+
+FEATURES = ["f1", "f2", "f3"]
+COLUMNS_FOR_IDS = ["index", "name"]
+
+
+def _read_tsv(output_path):
+    with open(output_path, 'r') as output_handle:
+        return [line.rstrip('\n').split('\t') for line in output_handle]
+
+
+def _read_hdf5(output_path):
+    with h5py.File(output_path, 'r') as output_handle:
+        return output_handle["data"][()]
+
+
+class TestHandlerReset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+        random_state = np.random.RandomState(0)
+        # The predictions and ids for 2 inputs, with 2 and 3 rows
+        self.predictions = [random_state.rand(2, 3), random_state.rand(3, 3)]
+        self.base_predictions = [random_state.rand(2, 3),
+                                 random_state.rand(3, 3)]
+        self.ids = [[[0, "a0"], [1, "a1"]],
+                    [[0, "b0"], [1, "b1"], [2, "b2"]]]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _prefix(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def _run_write_predictions(self, output_format):
+        handler = WritePredictionsHandler(
+            FEATURES, COLUMNS_FOR_IDS, self._prefix("a"), output_format,
+            output_size=2)
+        handler.handle_batch_predictions(self.predictions[0], self.ids[0])
+        handler.reset(self._prefix("b"), output_size=3)
+        handler.handle_batch_predictions(self.predictions[1], self.ids[1])
+        handler.write_to_file()
+
+    def _run_write_ref_alt(self, output_format):
+        handler = WriteRefAltHandler(
+            FEATURES, COLUMNS_FOR_IDS, self._prefix("a"), output_format,
+            output_size=2)
+        handler.handle_batch_predictions(
+            self.predictions[0], self.ids[0], self.base_predictions[0])
+        handler.reset(self._prefix("b"), output_size=3)
+        handler.handle_batch_predictions(
+            self.predictions[1], self.ids[1], self.base_predictions[1])
+        handler.write_to_file()
+
+    def _assert_tsv(self, filename, predictions, ids):
+        rows = _read_tsv(os.path.join(self.output_dir, filename))
+        self.assertEqual(rows[0], COLUMNS_FOR_IDS + FEATURES)
+        self.assertEqual(rows[1:],
+                         [[str(i) for i in row_ids] +
+                          probabilities_to_string(list(row_predictions))
+                          for (row_ids, row_predictions)
+                          in zip(ids, predictions)])
+
+    def _assert_hdf5(self, filename, labels_filename, predictions, ids):
+        np.testing.assert_array_equal(
+            _read_hdf5(os.path.join(self.output_dir, filename)),
+            predictions)
+        rows = _read_tsv(os.path.join(self.output_dir, labels_filename))
+        self.assertEqual(rows, [COLUMNS_FOR_IDS] +
+                         [[str(i) for i in row_ids] for row_ids in ids])
+
+    def test_write_predictions_reset_tsv(self):
+        self._run_write_predictions("tsv")
+        self._assert_tsv(
+            "a_predictions.tsv", self.predictions[0], self.ids[0])
+        self._assert_tsv(
+            "b_predictions.tsv", self.predictions[1], self.ids[1])
+
+    def test_write_predictions_reset_hdf5(self):
+        self._run_write_predictions("hdf5")
+        self._assert_hdf5("a_predictions.h5", "a_row_labels.txt",
+                          self.predictions[0], self.ids[0])
+        self._assert_hdf5("b_predictions.h5", "b_row_labels.txt",
+                          self.predictions[1], self.ids[1])
+
+    def test_write_ref_alt_reset_tsv(self):
+        self._run_write_ref_alt("tsv")
+        for (i, name) in enumerate("ab"):
+            self._assert_tsv("{0}.ref_predictions.tsv".format(name),
+                             self.base_predictions[i], self.ids[i])
+            self._assert_tsv("{0}.alt_predictions.tsv".format(name),
+                             self.predictions[i], self.ids[i])
+
+    def test_write_ref_alt_reset_hdf5(self):
+        self._run_write_ref_alt("hdf5")
+        for (i, name) in enumerate("ab"):
+            labels_filename = "{0}_row_labels.txt".format(name)
+            self._assert_hdf5("{0}.ref_predictions.h5".format(name),
+                              labels_filename,
+                              self.base_predictions[i], self.ids[i])
+            np.testing.assert_array_equal(
+                _read_hdf5(os.path.join(
+                    self.output_dir, "{0}.alt_predictions.h5".format(name))),
+                self.predictions[i])
+
+
+class TestBackgroundWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+        random_state = np.random.RandomState(0)
+        self.predictions = [random_state.rand(n_rows, 3)
+                            for n_rows in (4, 4, 1, 4, 3)]
+        self.ids = []
+        n_rows = 0
+        for predictions in self.predictions:
+            self.ids.append([[i, "s{0}".format(i)] for i in
+                             range(n_rows, n_rows + len(predictions))])
+            n_rows += len(predictions)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run(self, name, output_format, write_mem_limit):
+        handler = WritePredictionsHandler(
+            FEATURES, COLUMNS_FOR_IDS, os.path.join(self.output_dir, name),
+            output_format, output_size=16, write_mem_limit=write_mem_limit)
+        for (predictions, ids) in zip(self.predictions, self.ids):
+            handler.handle_batch_predictions(predictions, ids)
+        handler.write_to_file()
+        return handler
+
+    def test_tsv_matches_single_write(self):
+        # With a memory limit of 0, each batch is written on its own.
+        self._run("background", "tsv", 0)
+        self._run("single", "tsv", 1500)
+        background_rows = _read_tsv(
+            os.path.join(self.output_dir, "background_predictions.tsv"))
+        self.assertEqual(len(background_rows), 17)
+        self.assertEqual(
+            background_rows,
+            _read_tsv(os.path.join(self.output_dir, "single_predictions.tsv")))
+
+    def test_hdf5_matches_single_write(self):
+        self._run("background", "hdf5", 0)
+        self._run("single", "hdf5", 1500)
+        background_data = _read_hdf5(
+            os.path.join(self.output_dir, "background_predictions.h5"))
+        np.testing.assert_array_equal(background_data,
+                                      np.vstack(self.predictions))
+        np.testing.assert_array_equal(
+            background_data,
+            _read_hdf5(os.path.join(self.output_dir, "single_predictions.h5")))
+        self.assertEqual(
+            _read_tsv(os.path.join(self.output_dir,
+                                   "background_row_labels.txt")),
+            _read_tsv(os.path.join(self.output_dir,
+                                   "single_row_labels.txt")))
+
+    def test_close_trims_hdf5(self):
+        handler = WritePredictionsHandler(
+            FEATURES, COLUMNS_FOR_IDS,
+            os.path.join(self.output_dir, "a"), "hdf5", output_size=20)
+        for (predictions, ids) in zip(self.predictions, self.ids):
+            handler.handle_batch_predictions(predictions, ids)
+        output_path = os.path.join(self.output_dir, "a_predictions.h5")
+        handler.write_to_file()
+        self.assertEqual(_read_hdf5(output_path).shape, (20, 3))
+        handler.close()
+        np.testing.assert_array_equal(_read_hdf5(output_path),
+                                      np.vstack(self.predictions))
+
+    def test_write_error_is_raised(self):
+        output_dir = os.path.join(self.output_dir, "removed")
+        os.makedirs(output_dir)
+        handler = WritePredictionsHandler(
+            FEATURES, COLUMNS_FOR_IDS, os.path.join(output_dir, "a"), "tsv",
+            write_mem_limit=0)
+        os.remove(os.path.join(output_dir, "a_predictions.tsv"))
+        os.rmdir(output_dir)
+        handler.handle_batch_predictions(self.predictions[0], self.ids[0])
+        with self.assertRaises(FileNotFoundError):
+            handler.write_to_file()
+        self.assertIsNone(handler._writer)
+
+
+if __name__ == "__main__":
+    unittest.main()
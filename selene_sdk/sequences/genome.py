@@ -166,6 +166,27 @@ def _get_sequence_from_coords(len_chrs,
             Genome.UNK_BASE * end_pad)
 
 
+def _open_blacklist_tabix(blacklist_regions):
+    """
+    Open the tabix-indexed file of blacklist regions, if any, given as a
+    path or as "hg19"/"hg38" for the regions released by ENCODE.
+
+    """
+    if blacklist_regions == "hg19":
+        return tabix.open(
+            pkg_resources.resource_filename(
+                "selene_sdk",
+                "sequences/data/hg19_blacklist_ENCFF001TDO.bed.gz"))
+    elif blacklist_regions == "hg38":
+        return tabix.open(
+            pkg_resources.resource_filename(
+                "selene_sdk",
+                "sequences/data/hg38.blacklist.bed.gz"))
+    elif blacklist_regions is not None:  # user-specified file
+        return tabix.open(blacklist_regions)
+    return None
+
+
 class Genome(Sequence):
     """This class provides access to an organism's genomic sequence.
 
@@ -251,24 +272,12 @@ class Genome(Sequence):
         """
         Constructs a `Genome` object.
         """
+        self._input_path = input_path
+        self._blacklist_regions = blacklist_regions
         self.genome = pyfaidx.Fasta(input_path)
         self.chrs = sorted(self.genome.keys())
         self.len_chrs = self._get_len_chrs()
-        self._blacklist_tabix = None
-
-        if blacklist_regions == "hg19":
-            self._blacklist_tabix = tabix.open(
-                pkg_resources.resource_filename(
-                    "selene_sdk",
-                    "sequences/data/hg19_blacklist_ENCFF001TDO.bed.gz"))
-        elif blacklist_regions == "hg38":
-            self._blacklist_tabix = tabix.open(
-                pkg_resources.resource_filename(
-                    "selene_sdk",
-                    "sequences/data/hg38.blacklist.bed.gz"))
-        elif blacklist_regions is not None:  # user-specified file
-            self._blacklist_tabix = tabix.open(
-                blacklist_regions)
+        self._blacklist_tabix = _open_blacklist_tabix(blacklist_regions)
 
         if bases_order is not None:
             bases = [str.upper(b) for b in bases_order]
@@ -280,6 +289,21 @@ class Genome(Sequence):
             self.INDEX_TO_BASE = {ix: b for (ix, b) in enumerate(bases)}
             self.update_bases_order(bases)
 
+    def __getstate__(self):
+        # The file handles are not pickled: each process that unpickles
+        # (or copies) the genome opens its own, so that processes do not
+        # share file offsets.
+        state = self.__dict__.copy()
+        del state["genome"]
+        del state["_blacklist_tabix"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.genome = pyfaidx.Fasta(self._input_path)
+        self._blacklist_tabix = _open_blacklist_tabix(
+            self._blacklist_regions)
+
     @classmethod
     def update_bases_order(cls, bases):
         cls.BASES_ARR = bases
@@ -5,12 +5,78 @@ base class for biological sequence collections (e.g. genomes).
 """
 from abc import ABCMeta
 from abc import abstractmethod
+from functools import lru_cache
 
 import numpy as np
 
 from ._sequence import _fast_sequence_to_encoding
 
 
+def _get_encoding_table(n_bases):
+    """
+    Get the lookup table from base indices to one-hot encodings.
+
+    Parameters
+    ----------
+    n_bases : int
+        The size of the sequence type's alphabet, :math:`N`.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.float32
+        An :math:`(N + 1) \\times N` array, where row :math:`i < N` is
+        the encoding of the :math:`i`-th base in the alphabet and row
+        :math:`N` is the encoding of an unknown base.
+
+    """
+    table = np.zeros((n_bases + 1, n_bases), dtype=np.float32)
+    table[np.arange(n_bases), np.arange(n_bases)] = 1
+    table[n_bases, :] = np.divide(1, n_bases, dtype=np.float32)
+    return table
+
+
+def _get_base_index_lut(base_to_index, n_bases):
+    """
+    Get the lookup table from ASCII character codes to base indices.
+
+    Parameters
+    ----------
+    base_to_index : dict
+        A dict that maps the sequence type's bases to indices.
+    n_bases : int
+        The size of the sequence type's alphabet, :math:`N`.
+
+    Returns
+    -------
+    numpy.ndarray, dtype=numpy.uint8
+        An array of length 256 that maps each character code to the
+        index of that base, or to :math:`N` (the row of the unknown
+        base in `_get_encoding_table(n_bases)`) for characters that are
+        not in the alphabet.
+
+    """
+    lut = np.full(256, n_bases, dtype=np.uint8)
+    for (base, index) in base_to_index.items():
+        lut[ord(base)] = index
+    return lut
+
+
+@lru_cache(maxsize=16)
+def _get_encoding_lookup_tables(base_to_index_items, bases_size):
+    """
+    Get (and cache) the lookup tables from `_get_base_index_lut` and
+    `_get_encoding_table` used by `sequence_to_encoding`, or None if the
+    alphabet is not made of single ASCII characters.
+
+    """
+    for (base, _) in base_to_index_items:
+        # '?' is what non-ASCII characters are replaced with
+        if len(base) != 1 or not base.isascii() or base == '?':
+            return None
+    return (_get_base_index_lut(dict(base_to_index_items), bases_size),
+            _get_encoding_table(bases_size))
+
+
 def sequence_to_encoding(sequence, base_to_index, bases_arr):
     """Converts an input sequence to its one-hot encoding.
 
@@ -38,7 +104,16 @@ def sequence_to_encoding(sequence, base_to_index, bases_arr):
         the size of the sequence alphabet.
 
     """
-    return _fast_sequence_to_encoding(sequence, base_to_index, len(bases_arr))
+    tables = _get_encoding_lookup_tables(
+        tuple(base_to_index.items()), len(bases_arr))
+    if tables is None:
+        return _fast_sequence_to_encoding(
+            sequence, base_to_index, len(bases_arr))
+    # Two table lookups over the whole sequence replace a dict lookup
+    # per character; lowercase bases are handled by their own entries.
+    base_index_lut, encoding_table = tables
+    return encoding_table[base_index_lut[
+        np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)]]
 
 
 def _get_base_index(encoding_row):
@@ -1,7 +1,10 @@
+import copy
+import pickle
 import unittest
 
 import numpy as np
 
+from selene_sdk.sequences.genome import Genome
 from selene_sdk.sequences.genome import _get_sequence_from_coords
 from selene_sdk.sequences.sequence import sequence_to_encoding, \
     encoding_to_sequence
@@ -105,6 +108,16 @@ class TestGenome(unittest.TestCase):
         self.assertEqual(observed1, "")
         self.assertEqual(observed2, "")
 
+    def test_genome_pickle_reopens_files(self):
+        genome = Genome("selene_sdk/sequences/tests/files/small.fasta")
+        for other in (pickle.loads(pickle.dumps(genome)),
+                      copy.deepcopy(genome)):
+            self.assertIsNot(other.genome, genome.genome)
+            self.assertEqual(other.len_chrs, genome.len_chrs)
+            self.assertEqual(
+                other.get_sequence_from_coords("chr2", 10, 30, pad=True),
+                genome.get_sequence_from_coords("chr2", 10, 30, pad=True))
+
 
 if __name__ == "__main__":
     unittest.main()